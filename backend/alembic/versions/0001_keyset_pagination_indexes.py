@@ -0,0 +1,40 @@
+"""keyset pagination indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The tables are created by the app at startup, so on a fresh database they do not
+# exist yet and create_all builds these indexes from the models instead.
+INDEXES = {
+    "blocks": ("school_id", "sector_id"),
+    "problems": ("school_id", "sector_id", "block_id"),
+}
+
+
+def upgrade() -> None:
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for table, columns in INDEXES.items():
+        if table not in tables:
+            continue
+        for column in columns:
+            op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_id ON {table} ({column}, id)")
+
+
+def downgrade() -> None:
+    for table, columns in INDEXES.items():
+        for column in columns:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}_id")
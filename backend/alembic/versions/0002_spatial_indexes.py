@@ -0,0 +1,38 @@
+"""spatial indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# GiST indexes of the geometry columns, named as GeoAlchemy2 names the ones create_all
+# builds for new tables, so databases created either way end up with the same indexes.
+INDEXES = {
+    "blocks": "point",
+    "sectors": "area",
+    "schools": "area",
+}
+
+
+def upgrade() -> None:
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for table, column in INDEXES.items():
+        if table in tables:
+            op.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} USING gist ({column})")
+
+
+def downgrade() -> None:
+    for table, column in INDEXES.items():
+        op.execute(f"DROP INDEX IF EXISTS idx_{table}_{column}")
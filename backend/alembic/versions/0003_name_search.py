@@ -0,0 +1,44 @@
+"""name search
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("problems", "blocks", "sectors", "schools")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+        $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """)
+
+    # Tables the app has not created yet get the indexes from create_all
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for table in TABLES:
+        if table in tables:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm ON {table} USING gin (f_unaccent(name) gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_name_trgm")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
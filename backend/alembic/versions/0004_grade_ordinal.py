@@ -0,0 +1,55 @@
+"""grade ordinal
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.grades import problem_grade_ordinal
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # A fresh database gets the column and indexes from create_all
+    if "problems" not in sa.inspect(bind).get_table_names():
+        return
+
+    op.execute("ALTER TABLE problems ADD COLUMN IF NOT EXISTS grade_ordinal SMALLINT")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_problems_grade_ordinal ON problems (grade_ordinal)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_problems_block_id_grade_ordinal ON problems (block_id, grade_ordinal)"
+    )
+
+    # Few distinct grade pairs: one UPDATE per pair
+    pairs = bind.execute(sa.text(
+        "SELECT DISTINCT grade, grade_ss FROM problems WHERE grade_ordinal IS NULL"
+    )).all()
+    for grade, grade_ss in pairs:
+        ordinal = problem_grade_ordinal(grade, grade_ss)
+        if ordinal is None:
+            continue
+        bind.execute(
+            sa.text(
+                "UPDATE problems SET grade_ordinal = :ordinal WHERE grade_ordinal IS NULL "
+                "AND grade IS NOT DISTINCT FROM :grade AND grade_ss IS NOT DISTINCT FROM :grade_ss"
+            ),
+            {"ordinal": ordinal, "grade": grade, "grade_ss": grade_ss}
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_problems_block_id_grade_ordinal")
+    op.execute("DROP INDEX IF EXISTS ix_problems_grade_ordinal")
+    op.execute("ALTER TABLE problems DROP COLUMN IF EXISTS grade_ordinal")
@@ -4,6 +4,9 @@ from app.api.v1.block import router as block_router
 from app.api.v1.problem import router as problem_router
 from app.api.v1.user import router as user_router
 from app.api.v1.invitation import router as invitation_router
+from app.api.v1.tiles import router as tiles_router
+from app.api.v1.search import router as search_router
+from app.api.v1.stats import router as stats_router
 
 __all__ = [
     "school_router", 
@@ -11,5 +14,8 @@ __all__ = [
     "block_router", 
     "problem_router",
     "user_router",
-    "invitation_router"
+    "invitation_router",
+    "tiles_router",
+    "search_router",
+    "stats_router"
     ]
\ No newline at end of file
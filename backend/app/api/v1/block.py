@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
+import uuid
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from geoalchemy2 import functions as geofunc
+from sqlalchemy import select, func, cast, exists
+from geoalchemy2 import Geography, functions as geofunc
 from app.models.block import Block
 from app.database.connection import get_db
-from app.services.utils import wkt_to_geojson
+from app.services.utils import wkt_to_geojson, group_rows, keyset_page, after_cursor, parse_bbox, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.streaming import wants_ndjson, ndjson_response
+from app.services.cache import cached_json_response
+from app.services.geojson import GEOJSON_MODE, blocks_geojson
+from app.services.grades import grade_conditions
 from fastapi import FastAPI, Depends, HTTPException
 from app.services.utils import slugify
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -13,6 +17,7 @@ from sqlalchemy import select
 from app.models.school import School
 from app.models.sector import Sector
 from app.models.block import Block
+from app.models.problem import Problem
 
 import logging
 
@@ -24,72 +29,176 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Blocks"])
 
+BLOCK_COLUMNS = (Block.id, Block.name, Block.sector_id, Block.sector_name, Block.school_id, Block.school_name)
+MAX_NEAREST = 100
+# Blocks fetched by the KNN scan for each one returned by /blocks/nearest
+NEAREST_CANDIDATES = 4
+
+async def block_items(db: AsyncSession, blocks) -> list:
+    """JSON items of a batch of block rows, with the summaries of their problems."""
+    problems = group_rows((await db.execute(
+        select(Problem.id, Problem.name, Problem.grade, Problem.grade_ss, Problem.block_id)
+        .where(Problem.block_id.in_([b.id for b in blocks]))
+    )).all(), "block_id") if blocks else {}
+    return [{
+        "id": str(b.id),
+        "name": b.name,
+        "sector_id": str(b.sector_id),
+        "sector_name": str(b.sector_name),
+        "school_id": str(b.school_id),
+        "school_name": str(b.school_name),
+        "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in problems.get(b.id, [])]
+        }
+        for b in blocks
+    ]
+
 @router.get("/blocks")
-async def get_blocks(db: AsyncSession = Depends(get_db)):
+async def get_blocks(
+    request: Request,
+    school_id: uuid.UUID | None = None,
+    sector_id: uuid.UUID | None = None,
+    bbox: str | None = Query(None, description="minx,miny,maxx,maxy in WGS84 degrees"),
+    min_grade: str | None = Query(None, description="Font (6b+) or V (V5) grade"),
+    max_grade: str | None = Query(None, description="Font (6b+) or V (V5) grade"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Blocks ordered by id with their problem summaries, one page at a time.
+    Pass the returned next_cursor to get the following page; it is null on the last one.
+    bbox keeps the blocks inside a box, looked up in the GiST index of their points.
+    min_grade and max_grade keep the blocks with at least one problem in that range.
+    With stream=1 or Accept: application/x-ndjson, every block after the cursor
+    is streamed instead, one per line, and limit is ignored.
+    """
+    stmt = select(*BLOCK_COLUMNS)
+    if school_id:
+        stmt = stmt.where(Block.school_id == school_id)
+    if sector_id:
+        stmt = stmt.where(Block.sector_id == sector_id)
+    if bbox:
+        try:
+            stmt = stmt.where(Block.point.intersects(func.ST_MakeEnvelope(*parse_bbox(bbox), 4326)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if min_grade or max_grade:
+        try:
+            conditions = grade_conditions(Problem.grade_ordinal, min_grade, max_grade)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        stmt = stmt.where(exists().where(Problem.block_id == Block.id, *conditions))
+
+    if wants_ndjson(request, stream):
+        try:
+            return ndjson_response(after_cursor(stmt, Block.id, cursor), block_items)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        result = await db.execute(
-            select(Block).options(selectinload(Block.problems))
-        )
-        blocks = result.scalars().all()
-        return [{
-            "id": str(b.id),
-            "name": b.name,
-            "sector_id": str(b.sector_id),
-            "sector_name": str(b.sector_name),
-            "school_id": str(b.school_id),
-            "school_name": str(b.school_name),
-            "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in b.problems]
-            }
-            for b in blocks
-        ]
-    
+        blocks, next_cursor = await keyset_page(db, stmt, Block.id, cursor, limit)
+        items = await block_items(db, blocks)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting blocks: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@router.get("/{sector_id}/blocks")
-async def get_blocks_geojson(sector_id: str, db: AsyncSession = Depends(get_db)):
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/blocks/nearest")
+async def get_nearest_blocks(
+    lon: float = Query(..., ge=-180, le=180),
+    lat: float = Query(..., ge=-90, le=90),
+    k: int = Query(10, ge=1, le=MAX_NEAREST),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    The k blocks closest to lon/lat with their problem summaries and distance_meters,
+    nearest first. Candidates come from a KNN scan (<->) of the GiST index and are
+    ranked by their distance on the spheroid, which degrees do not measure.
+    """
+    here = func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326)
+    candidates = (
+        select(*BLOCK_COLUMNS, Block.point)
+        .order_by(Block.point.distance_centroid(here))
+        .limit(k * NEAREST_CANDIDATES)
+        .subquery()
+    )
+    distance = func.ST_Distance(cast(candidates.c.point, Geography(srid=4326)), cast(here, Geography(srid=4326)))
+
     try:
         result = await db.execute(
-            select(Block).where(Block.sector_id == sector_id
-            ).options(
-            selectinload(Block.school),
-            selectinload(Block.sector),
-            selectinload(Block.problems)
-            )
+            select(*(candidates.c[column.key] for column in BLOCK_COLUMNS), distance.label("distance"))
+            .order_by(distance)
+            .limit(k)
         )
-        blocks = result.scalars().all()
-
-
-        features = []
-        for b in blocks:
-            try:
-                geometry = wkt_to_geojson(b.point)
-            except:
-                geometry = None
-
-            features.append({
-                "type": "Feature",
-                "geometry": geometry,
-                "properties": {
-                    "id": str(b.id),
-                    "name": b.name,
-                    "sector_id": str(b.sector_id),
-                    "sector_name": str(b.sector_name),
-                    "school_id": str(b.school_id),
-                    "school_name": str(b.school_name),
-                    "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in b.problems]
-                }
-            })
-
-        return {
-            "type": "FeatureCollection",
-            "features": features
-        }
+        blocks = result.all()
+        items = await block_items(db, blocks)
+    except Exception as e:
+        logger.error(f"Error getting nearest blocks: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
+    for item, block in zip(items, blocks):
+        item["distance_meters"] = round(block.distance, 1)
+    return items
 
+@router.get("/{sector_id}/blocks")
+async def get_blocks_geojson(sector_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """Blocks of a sector as a GeoJSON FeatureCollection, served from the response cache."""
+    try:
+        return await cached_json_response(
+            request, db, f"blocks:{sector_id}", lambda: build_blocks(db, sector_id)
+        )
     except Exception as e:
         logger.error(f"Error getting blocks for {sector_id}: {e}")
         import traceback
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Internal server error")
+
+async def blocks_feature_collection(db: AsyncSession, sector_id: str) -> dict:
+    """Build the FeatureCollection of a sector's blocks from the database."""
+    result = await db.execute(
+        select(
+            Block.id, Block.name, Block.point, Block.sector_id, Block.sector_name, Block.school_id, Block.school_name
+        ).where(Block.sector_id == sector_id)
+    )
+    blocks = result.all()
+    problems = group_rows((await db.execute(
+        select(Problem.id, Problem.name, Problem.grade, Problem.grade_ss, Problem.block_id)
+        .where(Problem.block_id.in_([b.id for b in blocks]))
+    )).all(), "block_id")
+
+
+    features = []
+    for b in blocks:
+        try:
+            geometry = wkt_to_geojson(b.point)
+        except:
+            geometry = None
+
+        features.append({
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": {
+                "id": str(b.id),
+                "name": b.name,
+                "sector_id": str(b.sector_id),
+                "sector_name": str(b.sector_name),
+                "school_id": str(b.school_id),
+                "school_name": str(b.school_name),
+                "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in problems.get(b.id, [])]
+            }
+        })
+
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+async def build_blocks(db: AsyncSession, sector_id: str):
+    """Build the blocks FeatureCollection in PostGIS or in Python, depending on config.json geojsonMode."""
+    if GEOJSON_MODE == "python":
+        return await blocks_feature_collection(db, sector_id)
+    return await blocks_geojson(db, sector_id)
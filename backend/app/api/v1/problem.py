@@ -1,17 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, delete
 from sqlalchemy.orm.attributes import flag_modified
 
 import uuid
 from app.models.problem import Problem
-from app.models.block import Block
-from app.models.sector import Sector
-from app.models.school import School
 from app.models.user import User
 
 from app.services.auth import get_current_user
+from app.services.cache import bump_data_version
+from app.services.tiles import invalidate_problem_tiles
+from app.services.stats import refresh_stats
+from app.services.paths import path_resolver
+from app.services.sync import write_block_problems, check_problem_field
+from app.services.grades import problem_grade_ordinal, grade_conditions
+from app.services.utils import keyset_page, after_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.streaming import wants_ndjson, ndjson_response
 from app.database.connection import get_db
 
 import logging
@@ -24,59 +28,98 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Problems"])
 
+# Columns returned for each problem by the read endpoints
+PROBLEM_COLUMNS = (
+    Problem.id, Problem.name, Problem.grade, Problem.grade_ss, Problem.grade_ordinal, Problem.length, Problem.height,
+    Problem.positions, Problem.block_id, Problem.block_name, Problem.sector_id, Problem.sector_name,
+    Problem.school_id, Problem.school_name
+)
+
+def problem_item(p) -> dict:
+    """JSON item of a row selected with PROBLEM_COLUMNS."""
+    return {
+        "id": str(p.id),
+        "name": p.name,
+        "grade": p.grade,
+        "grade_ss": p.grade_ss,
+        "grade_ordinal": p.grade_ordinal,
+        "length": p.length,
+        "height": p.height,
+        "positions": p.positions,
+        "block_id": str(p.block_id),
+        "block_name": p.block_name,
+        "sector_id": str(p.sector_id),
+        "sector_name": p.sector_name,
+        "school_id": str(p.school_id),
+        "school_name": p.school_name
+    }
+
+async def problem_items(db: AsyncSession, rows) -> list:
+    """Serializer of the streamed problem list."""
+    return [problem_item(p) for p in rows]
+
 @router.get("/problems")
-async def list_problems(db: AsyncSession = Depends(get_db)):
+async def list_problems(
+    request: Request,
+    school_id: uuid.UUID | None = None,
+    sector_id: uuid.UUID | None = None,
+    block_id: uuid.UUID | None = None,
+    min_grade: str | None = Query(None, description="Font (6b+) or V (V5) grade"),
+    max_grade: str | None = Query(None, description="Font (6b+) or V (V5) grade"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Problems ordered by id, one page at a time. Pass the returned next_cursor
+    to get the following page; it is null on the last one.
+    min_grade and max_grade keep the problems whose harder grade is in that range.
+    With stream=1 or Accept: application/x-ndjson, every problem after the cursor
+    is streamed instead, one per line, and limit is ignored.
+    """
+    stmt = select(*PROBLEM_COLUMNS)
+    if school_id:
+        stmt = stmt.where(Problem.school_id == school_id)
+    if sector_id:
+        stmt = stmt.where(Problem.sector_id == sector_id)
+    if block_id:
+        stmt = stmt.where(Problem.block_id == block_id)
     try:
-        result = await db.execute(select(Problem))
-        problems = result.scalars().all()
-        return [
-            {
-                "id": str(p.id),
-                "name": p.name,
-                "grade": p.grade,
-                "grade_ss": p.grade_ss,
-                "length": p.length,
-                "height": p.height,
-                "positions": p.positions,
-                "block_id": str(p.block_id),
-                "block_name": p.block_name,
-                "sector_id": str(p.sector_id),
-                "sector_name": p.sector_name,
-                "school_id": str(p.school_id),
-                "school_name": p.school_name
-            }
-            for p in problems
-        ]
-    
+        stmt = stmt.where(*grade_conditions(Problem.grade_ordinal, min_grade, max_grade))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if wants_ndjson(request, stream):
+        try:
+            return ndjson_response(after_cursor(stmt, Problem.id, cursor), problem_items)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        problems, next_cursor = await keyset_page(db, stmt, Problem.id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error obteniendo bloques: {e}")
-        raise HTTPException(status_code=500, detail="Error interno del servidor")
+        logger.error(f"Error getting problems: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    return {
+        "items": [problem_item(p) for p in problems],
+        "next_cursor": next_cursor
+    }
 
 
 @router.get("/problem/{problem_id}")
 async def get_problem(problem_id: str, db: AsyncSession = Depends(get_db)):
     try:
         result = await db.execute(
-            select(Problem).where(Problem.id == problem_id))
-        p = result.scalar_one_or_none()
+            select(*PROBLEM_COLUMNS).where(Problem.id == problem_id))
+        p = result.one_or_none()
         if not p:
             raise HTTPException(status_code=404, detail="Problem not found")
     
-        return {
-                "id": str(p.id),
-                "name": p.name,
-                "grade": p.grade,
-                "grade_ss": p.grade_ss,
-                "length": p.length,
-                "height": p.height,
-                "positions": p.positions,
-                "block_id": str(p.block_id),
-                "block_name": p.block_name,
-                "sector_id": str(p.sector_id),
-                "sector_name": p.sector_name,
-                "school_id": str(p.school_id),
-                "school_name": p.school_name
-            }
+        return problem_item(p)
     
     except Exception as e:
         logger.error(f"Error getting problems: {e}")
@@ -85,38 +128,14 @@ async def get_problem(problem_id: str, db: AsyncSession = Depends(get_db)):
 
 @router.get("/{school}/{sector}/{block}/problems")
 async def get_problems(school: str, sector: str, block: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Block)
-        .options(selectinload(Block.problems))
-        .join(Block.sector)
-        .join(Sector.school)
-        .where(School.name == school)
-        .where(Sector.name == sector)
-        .where(Block.name == block)
-    )
-    block_obj = result.scalars().first()
+    path = await path_resolver.resolve(db, school, sector, block)
 
-    if not block_obj:
+    if not path.block_id:
         raise HTTPException(status_code=404, detail="Block not found")
 
-    return [
-        {
-            "id": str(p.id),
-            "name": p.name,
-            "grade": p.grade,
-            "grade_ss": p.grade_ss,
-            "length": p.length,
-            "height": p.height,
-            "positions": p.positions,
-            "block_id": str(p.block_id),
-            "block_name": p.block_name,
-            "sector_id": str(p.sector_id),
-            "sector_name": p.sector_name,
-            "school_id": str(p.school_id),
-            "school_name": p.school_name
-        }
-        for p in block_obj.problems
-    ]
+    result = await db.execute(select(*PROBLEM_COLUMNS).where(Problem.block_id == path.block_id))
+
+    return [problem_item(p) for p in result.all()]
 
 @router.post("/{school}/{sector}/{block}/new-problem", status_code=201)
 async def create_problem(
@@ -134,32 +153,21 @@ async def create_problem(
     if not problem_data.get("name"):
         raise HTTPException(status_code=400, detail="name is required")
 
-    result = await db.execute(select(School).where(School.name == school))
-    school_obj = result.scalars().first()
-    if not school_obj:
+    path = await path_resolver.resolve(db, school, sector, block)
+    if not path.school_id:
         raise HTTPException(status_code=404, detail=f"School '{school}' not found")
-
-    result = await db.execute(
-        select(Sector).where(Sector.name == sector, Sector.school_id == school_obj.id)
-    )
-    sector_obj = result.scalars().first()
-    if not sector_obj:
+    if not path.sector_id:
         raise HTTPException(status_code=404, detail=f"Sector '{sector}' not found in school '{school}'")
-
-    result = await db.execute(
-        select(Block).where(Block.name == block, Block.sector_id == sector_obj.id)
-    )
-    block_obj = result.scalars().first()
-    if not block_obj:
+    if not path.block_id:
         raise HTTPException(status_code=404, detail=f"Block '{block}' not found in sector '{sector}'")
 
     result = await db.execute(
-        select(Problem).where(
+        select(Problem.id).where(
             Problem.name == problem_data["name"],
-            Problem.block_id == block_obj.id
-        )
+            Problem.block_id == path.block_id
+        ).limit(1)
     )
-    if result.scalars().first():
+    if result.first():
         raise HTTPException(status_code=400, detail="A problem with that name already exists in this block")
     
     problem = Problem(
@@ -167,18 +175,23 @@ async def create_problem(
         name=problem_data.get("name"),
         grade=problem_data.get("grade"),
         grade_ss=problem_data.get("grade_ss"),
+        grade_ordinal=problem_grade_ordinal(problem_data.get("grade"), problem_data.get("grade_ss")),
         length=problem_data.get("length"),
         height=problem_data.get("heigth"),
         positions=problem_data.get("positions"),
-        block_id=block_obj.id,
-        block_name=block_obj.name,
-        sector_id=sector_obj.id,
-        sector_name=sector_obj.name,
-        school_id=school_obj.id,
-        school_name=school_obj.name
+        block_id=path.block_id,
+        block_name=block,
+        sector_id=path.sector_id,
+        sector_name=sector,
+        school_id=path.school_id,
+        school_name=school
     )
 
     db.add(problem)
+    await db.flush()
+    await invalidate_problem_tiles(db, [path.block_id])
+    await refresh_stats(db, [path.block_id])
+    await bump_data_version(db)
     await db.commit()
     await db.refresh(problem)
 
@@ -190,12 +203,12 @@ async def create_problem(
         "length": problem.length,
         "heigth": problem.height,
         "positions": problem.positions,
-        "block_id": block_obj.id,
-        "block_name": block_obj.name,
-        "sector_id": sector_obj.id,
-        "sector_name": sector_obj.name,
-        "school_id": school_obj.id,
-        "school_name": school_obj.name,
+        "block_id": path.block_id,
+        "block_name": block,
+        "sector_id": path.sector_id,
+        "sector_name": sector,
+        "school_id": path.school_id,
+        "school_name": school,
     }
 
 @router.delete("/problem/{problem_id}", status_code=200)
@@ -207,13 +220,15 @@ async def delete_problem(
     """
     Delete a specific problem.
     """
-    result = await db.execute(select(Problem).where(Problem.id == problem_id))
-    problem = result.scalars().first()
+    result = await db.execute(delete(Problem).where(Problem.id == problem_id).returning(Problem.block_id))
+    deleted = result.first()
 
-    if not problem:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Problem not found")
 
-    await db.delete(problem)
+    await invalidate_problem_tiles(db, [deleted.block_id])
+    await refresh_stats(db, [deleted.block_id])
+    await bump_data_version(db)
     await db.commit()
 
 @router.put("/problem/{problem_id}", status_code=200)
@@ -244,8 +259,12 @@ async def update_problem(
     if "positions" in problem_data:
         p.positions = problem_data["positions"]
         flag_modified(p, "positions")
+    p.grade_ordinal = problem_grade_ordinal(p.grade, p.grade_ss)
 
     db.add(p)
+    await db.flush()
+    await refresh_stats(db, [p.block_id])
+    await bump_data_version(db)
     await db.commit()
     await db.refresh(p)
 
@@ -258,3 +277,139 @@ async def update_problem(
         "heigth": p.height,
         "positions": p.positions,
     }
+
+# Keys of a problem payload, as in new-problem and PUT /problem/{id}, and their columns
+PROBLEM_DATA_FIELDS = {
+    "name": "name", "grade": "grade", "grade_ss": "grade_ss",
+    "length": "length", "heigth": "height", "positions": "positions",
+}
+MAX_BATCH_OPERATIONS = 1000
+
+def problem_values(data) -> dict:
+    """Columns set by a problem payload of the batch endpoint. Raises ValueError on wrong types."""
+    if not isinstance(data, dict):
+        raise ValueError("problem must be an object")
+    values = {}
+    for key, column in PROBLEM_DATA_FIELDS.items():
+        if key not in data:
+            continue
+        check_problem_field(column, data[key], key)
+        values[column] = data[key]
+    return values
+
+@router.post("/{school}/{sector}/{block}/problems/batch", status_code=200)
+async def batch_problems(
+    school: str,
+    sector: str,
+    block: str,
+    batch: dict,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create, update and delete problems of one block in a single transaction.
+    The body holds "operations", applied in order:
+      {"op": "create", "problem": {...}}, {"op": "update", "id": ..., "problem": {...}}
+      or {"op": "delete", "id": ...}, problem taking the fields of new-problem.
+    Names are checked against the block's problems as the operations leave them.
+    Returns one result per operation; if any of them fails nothing is written and
+    the results come in a 400 instead.
+    """
+    operations = batch.get("operations")
+    if not isinstance(operations, list):
+        raise HTTPException(status_code=400, detail="operations must be a list")
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+
+    path = await path_resolver.resolve(db, school, sector, block)
+    if not path.block_id:
+        raise HTTPException(status_code=404, detail=f"Block '{block}' not found in sector '{sector}'")
+
+    result = await db.execute(
+        select(Problem.id, Problem.name, Problem.grade, Problem.grade_ss).where(Problem.block_id == path.block_id)
+    )
+    existing = {row.id: row for row in result.all()}
+    names = {row.name: row.id for row in existing.values()}
+
+    new_rows, changed_rows, deleted, touched = [], [], [], set()
+    results = []
+    for index, operation in enumerate(operations):
+        op = operation.get("op") if isinstance(operation, dict) else None
+        item = {"index": index, "op": op}
+        results.append(item)
+        try:
+            if op not in ("create", "update", "delete"):
+                raise ValueError("op must be create, update or delete")
+
+            if op == "create":
+                problem_id = uuid.uuid4()
+                current = None
+            else:
+                try:
+                    problem_id = uuid.UUID(str(operation.get("id")))
+                except ValueError:
+                    raise ValueError("Invalid problem id")
+                current = existing.get(problem_id)
+                if current is None or problem_id in touched:
+                    raise ValueError("Problem not found in this block" if current is None
+                                     else "Problem already changed by an earlier operation")
+                item["id"] = str(problem_id)
+
+            if op == "delete":
+                if names.get(current.name) == problem_id:
+                    del names[current.name]
+                deleted.append(problem_id)
+                touched.add(problem_id)
+                item["status"] = "deleted"
+                continue
+
+            values = problem_values(operation.get("problem", {}))
+            name = values.get("name", current.name if current else None)
+            if not name:
+                raise ValueError("name is required")
+            if names.get(name, problem_id) != problem_id:
+                raise ValueError("A problem with that name already exists in this block")
+
+            if current and names.get(current.name) == problem_id:
+                del names[current.name]
+            names[name] = problem_id
+            grade = values.get("grade", current.grade if current else None)
+            grade_ss = values.get("grade_ss", current.grade_ss if current else None)
+            values["grade_ordinal"] = problem_grade_ordinal(grade, grade_ss)
+
+            if op == "create":
+                new_rows.append({
+                    **{column: None for column in PROBLEM_DATA_FIELDS.values()},
+                    **values,
+                    "id": problem_id,
+                    "block_id": path.block_id,
+                    "block_name": block,
+                    "sector_id": path.sector_id,
+                    "sector_name": sector,
+                    "school_id": path.school_id,
+                    "school_name": school,
+                })
+                item["id"] = str(problem_id)
+                item["status"] = "created"
+            else:
+                changed_rows.append({"id": problem_id, **values})
+                touched.add(problem_id)
+                item["status"] = "updated"
+        except ValueError as e:
+            item["status"] = "error"
+            item["detail"] = str(e)
+
+    if any(item["status"] == "error" for item in results):
+        raise HTTPException(status_code=400, detail={"message": "No operation was applied", "results": results})
+
+    if deleted:
+        await db.execute(delete(Problem).where(Problem.id.in_(deleted)))
+    await write_block_problems(db, new_rows, changed_rows)
+    if new_rows or deleted:
+        await invalidate_problem_tiles(db, [path.block_id])
+    if results:
+        await refresh_stats(db, [path.block_id])
+        await bump_data_version(db)
+    await db.commit()
+
+    return {"results": results}
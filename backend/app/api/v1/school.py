@@ -1,12 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 from geoalchemy2 import functions as geofunc
 import traceback
 from app.models.school import School
+from app.models.sector import Sector
+from app.models.block import Block
+from app.models.problem import Problem
 from app.database.connection import get_db
-from app.services.utils import wkt_to_geojson
+from app.services.utils import wkt_to_geojson, group_rows
+from app.services.cache import cached_json_response
+from app.services.geojson import GEOJSON_MODE, schools_geojson
+from app.services.areas import lod_level, lod_area
+from app.services.tiles import MAX_ZOOM
 import logging
 
 logging.basicConfig(
@@ -18,50 +24,66 @@ logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Schools"])
     
 @router.get("/schools")
-async def get_schools_geojson(db: AsyncSession = Depends(get_db)):
+async def get_schools_geojson(
+    request: Request,
+    zoom: int | None = Query(None, ge=0, le=MAX_ZOOM),
+    tolerance: float | None = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Schools as a GeoJSON FeatureCollection, served from the response cache.
+    zoom or tolerance (degrees) select a simplified level of detail of the areas.
+    """
+    level = lod_level(zoom, tolerance)
     try:
-        result = await db.execute(
-            select(School)
-            .options(
-                selectinload(School.sectors),
-                selectinload(School.blocks),
-                selectinload(School.problems)
-            )
-        )
-        schools = result.scalars().all()
+        return await cached_json_response(request, db, f"schools:{level}", lambda: build_schools(db, level))
+    except Exception as e:
+        logger.error(f"Error getting schools: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        features = []
-        for school in schools:
-            if not school.area:
-                logger.warning(f"School {school.id} has no defined area")
-                continue
+async def schools_feature_collection(db: AsyncSession, level: int = 0) -> dict:
+    """Build the schools FeatureCollection from the database, with the areas at level of detail."""
+    schools = (await db.execute(select(School.id, School.name, lod_area(School, level).label("area")))).all()
+    sectors = group_rows((await db.execute(select(Sector.id, Sector.name, Sector.school_id))).all(), "school_id")
+    blocks = group_rows((await db.execute(select(Block.id, Block.name, Block.school_id))).all(), "school_id")
+    problems = group_rows((await db.execute(
+        select(Problem.id, Problem.name, Problem.grade, Problem.grade_ss, Problem.school_id)
+    )).all(), "school_id")
 
-            try:
-                geometry = wkt_to_geojson(school.area)
-                if not geometry:
-                    logger.warning(f"School {school.id} has empty geometry")
-                    continue
-            except Exception as e:
-                logger.error(f"Error parsing WKT for school {school.id}: {e}")
+    features = []
+    for school in schools:
+        if not school.area:
+            logger.warning(f"School {school.id} has no defined area")
+            continue
+
+        try:
+            geometry = wkt_to_geojson(school.area)
+            if not geometry:
+                logger.warning(f"School {school.id} has empty geometry")
                 continue
+        except Exception as e:
+            logger.error(f"Error parsing WKT for school {school.id}: {e}")
+            continue
 
-            features.append({
-                "type": "Feature",
-                "geometry": geometry,
-                "properties": {
-                    "id": str(school.id),
-                    "name": school.name,
-                    "sectors": [{"id": str(s.id), "name": s.name} for s in getattr(school, "sectors", [])],
-                    "blocks": [{"id": str(b.id), "name": b.name} for b in getattr(school, "blocks", [])],
-                    "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in getattr(school, "problems", [])]
-                }
-            })
+        features.append({
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": {
+                "id": str(school.id),
+                "name": school.name,
+                "sectors": [{"id": str(s.id), "name": s.name} for s in sectors.get(school.id, [])],
+                "blocks": [{"id": str(b.id), "name": b.name} for b in blocks.get(school.id, [])],
+                "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in problems.get(school.id, [])]
+            }
+        })
 
-        return {
-            "type": "FeatureCollection",
-            "features": features
-        }
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
 
-    except Exception as e:
-        logger.error(f"Error getting schools: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+async def build_schools(db: AsyncSession, level: int = 0):
+    """Build the schools FeatureCollection in PostGIS or in Python, depending on config.json geojsonMode."""
+    if GEOJSON_MODE == "python":
+        return await schools_feature_collection(db, level)
+    return await schools_geojson(db, level)
@@ -0,0 +1,41 @@
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.connection import get_db
+from app.services.search import SEARCH_TYPES, SEARCH_MIN_LENGTH, search
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Search"])
+
+MAX_SEARCH_RESULTS = 100
+
+@router.get("/search")
+async def search_catalogue(
+    q: str = Query(..., min_length=SEARCH_MIN_LENGTH, max_length=100),
+    types: List[str] = Query(list(SEARCH_TYPES), alias="type", description="problem, block, sector and/or school"),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Problems, blocks, sectors and schools whose name matches q, ignoring case and
+    accents, best first. Names starting with q rank above those merely containing it
+    or a similar word, so it also serves as-you-type suggestions.
+    """
+    unknown = set(types) - set(SEARCH_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(sorted(unknown))}")
+
+    try:
+        return await search(db, q.strip(), types, limit)
+    except Exception as e:
+        logger.error(f"Error searching '{q}': {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
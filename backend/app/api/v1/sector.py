@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 from geoalchemy2 import functions as geofunc
 import traceback
 from app.models.sector import Sector
+from app.models.block import Block
+from app.models.problem import Problem
 from app.database.connection import get_db
-from app.services.utils import wkt_to_geojson
+from app.services.utils import wkt_to_geojson, group_rows
+from app.services.cache import cached_json_response
+from app.services.geojson import GEOJSON_MODE, sectors_geojson
+from app.services.areas import lod_level, lod_area
+from app.services.tiles import MAX_ZOOM
 import logging
 
 logging.basicConfig(
@@ -22,10 +27,12 @@ router = APIRouter(tags=["Sectors"])
 @router.get("/sectors")
 async def list_schools(db: AsyncSession = Depends(get_db)):
     try:
-        result = await db.execute(
-            select(Sector).options(selectinload(Sector.blocks))
-        )
-        sectors = result.scalars().all()
+        result = await db.execute(select(Sector.id, Sector.name, Sector.school_id, Sector.school_name))
+        sectors = result.all()
+        blocks = group_rows((await db.execute(select(Block.id, Block.name, Block.sector_id))).all(), "sector_id")
+        problems = group_rows((await db.execute(
+            select(Problem.id, Problem.name, Problem.grade, Problem.grade_ss, Problem.sector_id)
+        )).all(), "sector_id")
 
         data = []
         for s in sectors:
@@ -35,8 +42,8 @@ async def list_schools(db: AsyncSession = Depends(get_db)):
                 "name": s.name,
                 "school_id": str(s.school_id),
                 "school_name": s.school_name,
-                "blocks": [{"id": str(b.id), "name": b.name} for b in s.blocks],
-                "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in s.problems]
+                "blocks": [{"id": str(b.id), "name": b.name} for b in blocks.get(s.id, [])],
+                "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in problems.get(s.id, [])]
             })
 
         return data
@@ -47,47 +54,73 @@ async def list_schools(db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=500, detail="INternal server error")
     
 @router.get("/{school_id}/sectors")
-async def get_sectors_geojson(school_id: str, db: AsyncSession = Depends(get_db)):
+async def get_sectors_geojson(
+    school_id: str,
+    request: Request,
+    zoom: int | None = Query(None, ge=0, le=MAX_ZOOM),
+    tolerance: float | None = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Sectors of a school as a GeoJSON FeatureCollection, served from the response cache.
+    zoom or tolerance (degrees) select a simplified level of detail of the areas.
+    """
+    level = lod_level(zoom, tolerance)
     try:
-        result = await db.execute(
-            select(
-                Sector
-            ).where(
-                Sector.school_id == school_id
-            ).options(
-            selectinload(Sector.school),
-            selectinload(Sector.blocks),
-            selectinload(Sector.problems)
-            )
+        return await cached_json_response(
+            request, db, f"sectors:{school_id}:{level}", lambda: build_sectors(db, school_id, level)
         )
-        sectors = result.scalars().all()
+    except Exception as e:
+        logger.error(f"Error getting sector: {e}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        features = []
-        for s in sectors:
-            try:
-                geometry = wkt_to_geojson(s.area)
-            except:
-                geometry = None
+async def sectors_feature_collection(db: AsyncSession, school_id: str, level: int = 0) -> dict:
+    """Build the FeatureCollection of a school's sectors from the database, with the areas at level of detail."""
+    result = await db.execute(
+        select(
+            Sector.id, Sector.name, lod_area(Sector, level).label("area"), Sector.school_id, Sector.school_name
+        ).where(
+            Sector.school_id == school_id
+        )
+    )
+    sectors = result.all()
+    sector_ids = [s.id for s in sectors]
+    blocks = group_rows((await db.execute(
+        select(Block.id, Block.name, Block.sector_id).where(Block.sector_id.in_(sector_ids))
+    )).all(), "sector_id")
+    problems = group_rows((await db.execute(
+        select(Problem.id, Problem.name, Problem.grade, Problem.grade_ss, Problem.sector_id)
+        .where(Problem.sector_id.in_(sector_ids))
+    )).all(), "sector_id")
 
-            features.append({
-                "type": "Feature",
-                "geometry": geometry,
-                "properties": {
-                    "id": str(s.id),
-                    "name": s.name,
-                    "school_id": str(s.school_id),
-                    "school_name": str(s.school_name),
-                    "blocks": [{"id": str(b.id), "name": b.name} for b in s.blocks],
-                    "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in s.problems]
-                }
-            })
+    features = []
+    for s in sectors:
+        try:
+            geometry = wkt_to_geojson(s.area)
+        except:
+            geometry = None
 
-        return {
-            "type": "FeatureCollection",
-            "features": features
-        }
+        features.append({
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": {
+                "id": str(s.id),
+                "name": s.name,
+                "school_id": str(s.school_id),
+                "school_name": str(s.school_name),
+                "blocks": [{"id": str(b.id), "name": b.name} for b in blocks.get(s.id, [])],
+                "problems": [{"id": str(p.id), "name": p.name, "grade": p.grade, "grade_ss": p.grade_ss} for p in problems.get(s.id, [])]
+            }
+        })
 
-    except Exception as e:
-        logger.error(f"Error getting sector: {e}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+async def build_sectors(db: AsyncSession, school_id: str, level: int = 0):
+    """Build the sectors FeatureCollection in PostGIS or in Python, depending on config.json geojsonMode."""
+    if GEOJSON_MODE == "python":
+        return await sectors_feature_collection(db, school_id, level)
+    return await sectors_geojson(db, school_id, level)
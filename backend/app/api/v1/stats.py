@@ -0,0 +1,45 @@
+import uuid
+
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.connection import get_db
+from app.services.cache import cached_json_response
+from app.services.stats import STATS_KINDS, load_stats
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Stats"])
+
+@router.get("/stats")
+async def get_stats(
+    request: Request,
+    kind: str = Query("school", description="school, sector or block"),
+    school_id: uuid.UUID | None = None,
+    sector_id: uuid.UUID | None = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Problem count, block count, grade range and grade histogram of every school,
+    sector or block (kind), or of those in one school or sector. Read from the
+    statistics kept up to date on sync and problem writes, served from the response cache.
+    """
+    if kind not in STATS_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown kind '{kind}'")
+    if sector_id and kind == "school":
+        raise HTTPException(status_code=400, detail="sector_id does not apply to schools")
+
+    try:
+        return await cached_json_response(
+            request, db, f"stats:{kind}:{school_id or ''}:{sector_id or ''}",
+            lambda: load_stats(db, kind, school_id, sector_id)
+        )
+    except Exception as e:
+        logger.error(f"Error getting {kind} stats: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
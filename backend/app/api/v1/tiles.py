@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Path
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.connection import get_db
+from app.services.cache import etag_matches
+from app.services.tiles import LAYERS, MAX_ZOOM, MVT_MEDIA_TYPE, tile_cache, build_tile
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Tiles"])
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}.mvt")
+async def get_tile(
+    layer: str,
+    request: Request,
+    z: int = Path(..., ge=0, le=MAX_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Mapbox Vector Tile of the schools, sectors or blocks layer, with the id, name and
+    problem count of each feature. Tiles are cached until a change touches them.
+    """
+    if layer not in LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown layer '{layer}'")
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=400, detail=f"Tile {z}/{x}/{y} is out of range")
+
+    try:
+        version = await tile_cache.refresh(db)
+        entry = await tile_cache.get_or_build((layer, z, x, y), version, lambda: build_tile(db, layer, z, x, y))
+    except Exception as e:
+        logger.error(f"Error getting tile {layer}/{z}/{x}/{y}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type=MVT_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,117 @@
+import json
+import asyncio
+import logging
+from typing import List, Optional
+
+import typer
+
+from app.database.connection import engine, AsyncSessionLocal, Base
+from app.services.sync import BASE_PATH, SYNC_DEFAULTS, update, sync_params
+from app.services.scanner import normalize_scopes
+from app.services.areas import refresh_dirty_areas, refresh_area_lods
+from app.services.cache import bump_data_version
+from app.services.stats import refresh_stats
+from app.services.watcher import ModelsWatcher
+
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="OpenPedra maintenance commands.", no_args_is_help=True)
+
+def _echo(result):
+    typer.echo(json.dumps(result, indent=2, default=str))
+
+async def _run(fn):
+    """Create the tables if needed, run fn(db) in a session and release the engine."""
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            return await fn(db)
+    finally:
+        await engine.dispose()
+
+@app.command()
+def sync(
+    paths: Optional[List[str]] = typer.Argument(
+        None, help="school, school/sector or school/sector/block paths to sync. Everything if omitted."
+    ),
+    force: bool = typer.Option(False, help="Ignore the manifest and rewrite every block."),
+    update_problems: Optional[bool] = typer.Option(
+        None, help="Also update existing problems. Defaults to config.json updateProblems."
+    ),
+    dry_run: bool = typer.Option(False, help="Only report what would change and per-stage timings."),
+):
+    """Sync schools, sectors, blocks and problems from the models directory."""
+    try:
+        normalize_scopes(paths)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    overrides = {"force": force, "dry_run": dry_run, "paths": paths or None}
+    if update_problems is not None:
+        overrides["update_problems"] = update_problems
+    params = sync_params(**overrides)
+    _echo(asyncio.run(_run(lambda db: update(db, **params))))
+
+@app.command()
+def areas(
+    lods: bool = typer.Option(False, help="Also rebuild the simplified levels of detail of every area."),
+):
+    """Recalculate the sector and school areas flagged as dirty."""
+
+    async def refresh(db):
+        result = await refresh_dirty_areas(
+            db, buffer_meters=SYNC_DEFAULTS["buffer_meters"], mode=SYNC_DEFAULTS["geometry_mode"]
+        )
+        if lods:
+            await refresh_area_lods(db)
+            await bump_data_version(db)
+            await db.commit()
+        return result
+
+    _echo(asyncio.run(_run(refresh)))
+
+@app.command()
+def stats():
+    """Rebuild the problem statistics of every school, sector and block."""
+
+    async def rebuild(db):
+        await refresh_stats(db)
+        await bump_data_version(db)
+        await db.commit()
+        return {"stats": "rebuilt"}
+
+    _echo(asyncio.run(_run(rebuild)))
+
+@app.command()
+def watch(
+    debounce: float = typer.Option(2.0, help="Seconds without changes before syncing."),
+    polling: bool = typer.Option(False, help="Poll the directory instead of using inotify."),
+):
+    """Watch the models directory and sync the changed subtrees until interrupted."""
+
+    async def on_change(paths):
+        params = sync_params(paths=paths)
+        async with AsyncSessionLocal() as db:
+            result = await update(db, **params)
+        logger.info(f"Synced {paths or 'all'}: {len(result['blocks_created_or_updated'])} blocks, "
+                    f"{len(result['problems_created'])} problems created")
+
+    async def main():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        watcher = ModelsWatcher(BASE_PATH, on_change, debounce=debounce, force_polling=polling)
+        await watcher.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await watcher.stop()
+            await engine.dispose()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    app()
@@ -9,6 +9,12 @@ from app.models.block import Block
 from app.models.problem import Problem
 from app.models.user import User
 from app.models.invitation import Invitation
+from app.models.sync_manifest import SyncManifest
+from app.models.dirty_area import DirtyArea
+from app.models.data_version import DataVersion
+from app.models.tile_invalidation import TileInvalidation
+from app.models.area_lod import AreaLod
+from app.models.catalogue_stats import CatalogueStats
 
 logging.basicConfig()
 logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
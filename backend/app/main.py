@@ -8,9 +8,14 @@ from app.database.connection import engine, AsyncSessionLocal, Base, get_db
 import app.api.v1 as api_openpedra
 from app.settings.config import settings
 import logging
-from app.services.sync import update
+from app.services.sync import BASE_PATH, sync_params
+from app.services.scanner import normalize_scopes
+from app.services.jobs import sync_jobs
+from app.services.watcher import ModelsWatcher
+from app.services.areas import refresh_dirty_areas
 from app.services.utils import slugify
 from app.services.initial_admin import create_initial_admin
+from app.services.stats import ensure_stats
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.school import School
@@ -52,13 +57,8 @@ async def startup():
     logger.info("Tables created or already exist")
 
     if config.get("updateGeometries", False):
-        buffer_meters = config.get("geometriesBuffer", 5)
-        async with AsyncSessionLocal() as db:
-            try:
-                await update(db, buffer_meters=buffer_meters)
-                logger.info(f"Update executed successfully on app startup with buffer {buffer_meters}m.")
-            except Exception as e:
-                logger.error(f"Error executing update on startup: {e}")
+        job = sync_jobs.submit(**sync_params())
+        logger.info(f"Update scheduled on app startup as job {job.id}.")
     else:
         logger.info("Skipping geometry update due to config.json settings.")
 
@@ -67,9 +67,31 @@ async def startup():
     except Exception as e:
         logger.error(f"Could not create initial admin: {e}")
 
+    try:
+        async with AsyncSessionLocal() as db:
+            await ensure_stats(db)
+    except Exception as e:
+        logger.error(f"Could not build the catalogue statistics: {e}")
+
+    if config.get("watchModels", False):
+        app.state.watcher = ModelsWatcher(
+            BASE_PATH,
+            sync_watched_paths,
+            debounce=config.get("watchDebounce", 2),
+            force_polling=config.get("watchPolling", False)
+        )
+        await app.state.watcher.start()
+
+async def sync_watched_paths(paths):
+    """Queue a sync limited to the paths reported by the models watcher."""
+    sync_jobs.submit(coalesce_running=False, **sync_params(paths=paths))
+
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Application shutting down...")
+    watcher = getattr(app.state, "watcher", None)
+    if watcher:
+        await watcher.stop()
     await engine.dispose()
 
 router_prefix = "/v1"
@@ -79,6 +101,9 @@ app.include_router(api_openpedra.block_router, prefix=router_prefix, tags=["Bloc
 app.include_router(api_openpedra.problem_router, prefix=router_prefix, tags=["Problems"])
 app.include_router(api_openpedra.user_router, prefix=router_prefix, tags=["Users"])
 app.include_router(api_openpedra.invitation_router, prefix=router_prefix, tags=["Invitations"])
+app.include_router(api_openpedra.tiles_router, prefix=router_prefix, tags=["Tiles"])
+app.include_router(api_openpedra.search_router, prefix=router_prefix, tags=["Search"])
+app.include_router(api_openpedra.stats_router, prefix=router_prefix, tags=["Stats"])
 
 @app.get("/")
 async def root():
@@ -88,12 +113,59 @@ async def root():
 async def healthcheck():
     return {"status": "ok"}
 
-@app.post("/update")
-async def api_update_all(db: AsyncSession = Depends(get_db)):
+@app.post("/update", status_code=202)
+async def api_update_all(
+    force: bool = False,
+    update_problems: bool | None = None,
+    dry_run: bool = False,
+    school: str | None = None,
+    sector: str | None = None,
+    block: str | None = None
+):
+    """
+    Queue an update of all blocks and problems from the 3DTiles directories and
+    return its job right away; poll GET /update/{job_id} for progress and result.
+    school, school + sector or school + sector + block limit the sync to that subtree
+    and to the areas enclosing it.
+    Unchanged blocks are skipped unless force is set.
+    update_problems also rewrites existing problems whose fields changed in problems.json.
+    dry_run only computes the change plan and per-stage filesystem/DB timings, writing nothing.
+    A request covered by a queued or running job returns that job instead.
+    """
+    overrides = {"force": force, "dry_run": dry_run}
+    if update_problems is not None:
+        overrides["update_problems"] = update_problems
+    if school or sector or block:
+        if (sector and not school) or (block and not sector):
+            raise HTTPException(status_code=400, detail="sector requires school and block requires sector")
+        scope = tuple(name for name in (school, sector, block) if name)
+        try:
+            normalize_scopes([scope])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        overrides["paths"] = ["/".join(scope)]
+    return sync_jobs.submit(**sync_params(**overrides)).as_dict()
+
+@app.get("/update/{job_id}")
+async def api_update_status(job_id: str):
+    """
+    Current stage, items processed, per-stage timings and final result of a sync job.
+    """
+    job = sync_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Update job not found")
+    return job.as_dict()
+
+@app.post("/update/areas")
+async def api_update_areas(db: AsyncSession = Depends(get_db)):
     """
-    Update all blocks and problems by reading 3DTiles directories.
+    Recalculate only the sector and school areas flagged as dirty.
     """
-    return await update(db)
+    return await refresh_dirty_areas(
+        db,
+        buffer_meters=config.get("geometriesBuffer", 5),
+        mode=config.get("geometriesMode", "postgis")
+    )
 
 @app.get("/config")
 def get_config():
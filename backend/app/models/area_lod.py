@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, SmallInteger
+from sqlalchemy.dialects.postgresql import UUID
+from geoalchemy2 import Geometry
+from app.models.base import Base
+
+class AreaLod(Base):
+    """Simplified copy of a sector or school area, one per level of detail (see app.services.areas)."""
+    __tablename__ = "area_lods"
+
+    kind = Column(String(16), primary_key=True)
+    entity_id = Column(UUID(as_uuid=True), primary_key=True)
+    level = Column(SmallInteger, primary_key=True)
+    geometry = Column(Geometry("GEOMETRY", srid=4326, spatial_index=False), nullable=False)
@@ -1,12 +1,19 @@
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, Index
 from geoalchemy2 import Geometry
 from app.models.base import Base
+from app.models.functions import name_search_index
 from sqlalchemy.orm import relationship
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 
 class Block(Base):
     __tablename__ = "blocks"
+    __table_args__ = (
+        # Keyset pagination of the filtered lists, ordered by id
+        Index("ix_blocks_school_id_id", "school_id", "id"),
+        Index("ix_blocks_sector_id_id", "sector_id", "id"),
+        name_search_index("blocks"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
@@ -21,14 +28,14 @@ class Block(Base):
     sector = relationship(
         "Sector", 
         back_populates="blocks", 
-        lazy='selectin', 
+        lazy='raise_on_sql', 
         foreign_keys=[sector_id]
         )
     
     school = relationship(
         "School", 
         back_populates="blocks", 
-        lazy='selectin', 
+        lazy='raise_on_sql', 
         foreign_keys=[school_id]
         )
 
@@ -36,6 +43,6 @@ class Block(Base):
         "Problem", 
         back_populates="block", 
         cascade="all, delete-orphan", 
-        lazy='selectin', 
+        lazy='raise_on_sql', 
         foreign_keys="[Problem.block_id]"
         )
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, SmallInteger, DateTime, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from app.models.base import Base
+
+class CatalogueStats(Base):
+    """Problem statistics of a school, sector or block (see app.services.stats)."""
+    __tablename__ = "catalogue_stats"
+
+    kind = Column(String(16), primary_key=True)
+    entity_id = Column(UUID(as_uuid=True), primary_key=True)
+    problem_count = Column(Integer, nullable=False, default=0)
+    # Null for blocks
+    block_count = Column(Integer, nullable=True)
+    min_grade_ordinal = Column(SmallInteger, nullable=True)
+    max_grade_ordinal = Column(SmallInteger, nullable=True)
+    # Font grade -> number of problems, graded problems only
+    grade_histogram = Column(JSONB, nullable=False, default=dict)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
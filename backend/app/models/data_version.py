@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, BigInteger
+from app.models.base import Base
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy.dialects.postgresql import UUID
+from app.models.base import Base
+
+class DirtyArea(Base):
+    __tablename__ = "dirty_areas"
+
+    kind = Column(String(16), primary_key=True)
+    entity_id = Column(UUID(as_uuid=True), primary_key=True)
+    marked_at = Column(DateTime(timezone=True), server_default=func.now())
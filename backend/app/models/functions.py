@@ -0,0 +1,21 @@
+from sqlalchemy import DDL, Index, event, text
+from app.models.base import Base
+
+# unaccent() is only STABLE, so indexes go through this IMMUTABLE wrapper, which pins the dictionary
+F_UNACCENT = """
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+"""
+
+# Created before the tables, whose search indexes use them
+for statement in (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    F_UNACCENT,
+):
+    event.listen(Base.metadata, "before_create", DDL(statement))
+
+def name_search_index(table: str) -> Index:
+    """Trigram GIN index of the accent-free name of a table, used by /search."""
+    return Index(f"ix_{table}_name_trgm", text("f_unaccent(name) gin_trgm_ops"), postgresql_using="gin")
@@ -1,16 +1,29 @@
-from sqlalchemy import Column, String, ForeignKey, Float, Boolean
+from sqlalchemy import Column, String, ForeignKey, Index, Float, Boolean, SmallInteger
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.models.base import Base
+from app.models.functions import name_search_index
 from sqlalchemy.orm import relationship
 import uuid
 
 class Problem(Base):
     __tablename__ = "problems"
+    __table_args__ = (
+        # Keyset pagination of the filtered lists, ordered by id
+        Index("ix_problems_school_id_id", "school_id", "id"),
+        Index("ix_problems_sector_id_id", "sector_id", "id"),
+        Index("ix_problems_block_id_id", "block_id", "id"),
+        # Grade range filters of the problem and block lists
+        Index("ix_problems_grade_ordinal", "grade_ordinal"),
+        Index("ix_problems_block_id_grade_ordinal", "block_id", "grade_ordinal"),
+        name_search_index("problems"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     grade = Column(String, nullable=True)
     grade_ss = Column(String, nullable=True)
+    # Harder of grade and grade_ss on a numeric scale, see app.services.grades
+    grade_ordinal = Column(SmallInteger, nullable=True)
     length = Column(Float, nullable=True)
     height = Column(Float, nullable=True)
     positions = Column(JSONB, nullable=True)
@@ -26,20 +39,20 @@ class Problem(Base):
     block = relationship(
         "Block", 
         back_populates="problems", 
-        lazy='selectin', 
+        lazy='raise_on_sql', 
         foreign_keys=[block_id]
         )
 
     sector = relationship(
         "Sector", 
         back_populates="problems", 
-        lazy='selectin', 
+        lazy='raise_on_sql', 
         foreign_keys=[sector_id]
         )
     
     school = relationship(
         "School", 
         back_populates="problems", 
-        lazy='selectin', 
+        lazy='raise_on_sql', 
         foreign_keys=[school_id]
         )
\ No newline at end of file
@@ -1,12 +1,16 @@
 from sqlalchemy import Column, String
 from geoalchemy2 import Geometry
 from app.models.base import Base
+from app.models.functions import name_search_index
 from sqlalchemy.orm import relationship
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 
 class School(Base):
     __tablename__ = "schools"
+    __table_args__ = (
+        name_search_index("schools"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
@@ -16,7 +20,7 @@ class School(Base):
         "Sector", 
         back_populates="school", 
         cascade="all, delete-orphan", 
-        lazy='selectin',
+        lazy='raise_on_sql',
         foreign_keys="[Sector.school_id]"
         )
     
@@ -24,7 +28,7 @@ class School(Base):
         "Block", 
         back_populates="school", 
         cascade="all, delete-orphan", 
-        lazy='selectin',
+        lazy='raise_on_sql',
         foreign_keys="[Block.school_id]"
         )
     
@@ -32,6 +36,6 @@ class School(Base):
         "Problem", 
         back_populates="school", 
         cascade="all, delete-orphan", 
-        lazy='selectin',
+        lazy='raise_on_sql',
         foreign_keys="[Problem.school_id]"
         )
@@ -1,12 +1,16 @@
 from sqlalchemy import Column, String, ForeignKey
 from geoalchemy2 import Geometry
 from app.models.base import Base
+from app.models.functions import name_search_index
 from sqlalchemy.orm import relationship
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 
 class Sector(Base):
     __tablename__ = "sectors"
+    __table_args__ = (
+        name_search_index("sectors"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
@@ -19,7 +23,7 @@ class Sector(Base):
     school = relationship(
         "School", 
         back_populates="sectors", 
-        lazy='selectin', 
+        lazy='raise_on_sql', 
         foreign_keys=[school_id]
         )
     
@@ -27,7 +31,7 @@ class Sector(Base):
         "Block", 
         back_populates="sector", 
         cascade="all, delete-orphan", 
-        lazy='selectin',
+        lazy='raise_on_sql',
         foreign_keys="[Block.sector_id]"
         )
     
@@ -35,6 +39,6 @@ class Sector(Base):
         "Problem", 
         back_populates="sector", 
         cascade="all, delete-orphan", 
-        lazy='selectin',
+        lazy='raise_on_sql',
         foreign_keys="[Problem.sector_id]"
         )
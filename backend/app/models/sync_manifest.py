@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Float, BigInteger, DateTime, func
+from app.models.base import Base
+
+class SyncManifest(Base):
+    __tablename__ = "sync_manifest"
+
+    path = Column(String, primary_key=True)
+    kind = Column(String(16), nullable=False)
+    mtime = Column(Float, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, BigInteger, String, Float, DateTime, Index, func
+from app.models.base import Base
+
+class TileInvalidation(Base):
+    """Bounds (WGS84) of a feature whose vector tiles changed, see app.services.tiles."""
+    __tablename__ = "tile_invalidations"
+    __table_args__ = (
+        Index("ix_tile_invalidations_version", "version"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    layer = Column(String(16), nullable=False)
+    min_lon = Column(Float, nullable=False)
+    min_lat = Column(Float, nullable=False)
+    max_lon = Column(Float, nullable=False)
+    max_lat = Column(Float, nullable=False)
+    # Data version of the transaction that recorded it, set by bump_data_version
+    version = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
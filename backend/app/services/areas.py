@@ -0,0 +1,325 @@
+import logging
+
+from shapely.geometry import Point, MultiPoint, LineString
+from shapely.ops import transform
+from pyproj import Transformer
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, func, cast, exists, tuple_, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import selectinload
+from geoalchemy2 import WKTElement, Geometry, Geography
+from shapely.wkt import loads as wkt_loads
+
+from app.models.school import School
+from app.models.sector import Sector
+from app.models.block import Block
+from app.models.dirty_area import DirtyArea
+from app.models.area_lod import AreaLod
+from app.services.cache import bump_data_version
+from app.services.tiles import invalidate_tiles
+
+logger = logging.getLogger(__name__)
+
+# Matches shapely's default buffer resolution (16 segments per quarter circle)
+BUFFER_STYLE = "quad_segs=16"
+
+# Simplification tolerance in degrees of each level of detail of the areas, level 0
+# being the full area: about 10 m, 100 m and 1 km
+AREA_LOD_TOLERANCES = (0.0001, 0.001, 0.01)
+# Width in degrees of a 256 px tile at zoom 0
+TILE_DEGREES = 360 / 256
+
+def calculate_convex_hull_area(points: list, buffer_meters: float = 5, utm_epsg: int = 32629):
+    """
+    Receive a list of shapely Points in WGS84 (lon, lat),
+    calculate convex hull and add buffer in meters.
+    Handle cases with 1, 2 or more points.
+    utm_epsg: EPSG of the UTM zone corresponding to your data.
+    """
+    if not points:
+        return None
+
+    transformer_to_utm = Transformer.from_crs("epsg:4326", f"epsg:{utm_epsg}", always_xy=True)
+    transformer_to_wgs84 = Transformer.from_crs(f"epsg:{utm_epsg}", "epsg:4326", always_xy=True)
+
+    if len(points) == 1:
+        point_utm = transform(transformer_to_utm.transform, points[0])
+        buffered = point_utm.buffer(buffer_meters)
+        return transform(transformer_to_wgs84.transform, buffered)
+
+    elif len(points) == 2:
+        line_utm = transform(transformer_to_utm.transform, LineString([(p.x, p.y) for p in points]))
+        buffered = line_utm.buffer(buffer_meters, cap_style=1)
+        return transform(transformer_to_wgs84.transform, buffered)
+
+    else:
+        multipoint_utm = MultiPoint([transform(transformer_to_utm.transform, p) for p in points])
+        hull = multipoint_utm.convex_hull
+        buffered = hull.buffer(buffer_meters)
+        return transform(transformer_to_wgs84.transform, buffered)
+
+async def refresh_areas_python(
+    db: AsyncSession,
+    buffer_meters: float = 5,
+    sector_ids: set | None = None,
+    school_ids: set | None = None
+):
+    """
+    Recalculate sector and school areas in Python:
+      - Sector areas from their block points (convex hull + buffer_meters)
+      - School areas from all block points of their sectors (convex hull + buffer_meters + 2)
+    sector_ids / school_ids restrict the recalculation; None means all.
+    """
+    sectors_stmt = select(Sector).options(selectinload(Sector.blocks))
+    if sector_ids is not None:
+        sectors_stmt = sectors_stmt.where(Sector.id.in_(sector_ids))
+    sectors_result = await db.execute(sectors_stmt)
+    sectors = sectors_result.scalars().all()
+
+    for sector in sectors:
+        points = []
+        for block in sector.blocks:
+            if block.point:
+                try:
+                    point = wkt_loads(str(block.point))
+                    points.append(Point(point.x, point.y))
+                except Exception as e:
+                    logger.error(f"Error reading point from block {block.id}: {e}")
+
+        logger.info(f"Sector {sector.name} has {len(points)} points")
+
+        if points:
+            hull = calculate_convex_hull_area(points, buffer_meters=buffer_meters)
+            sector.area = WKTElement(hull.wkt, srid=4326) if hull else None
+        else:
+            sector.area = None
+
+    await db.commit()
+
+    schools_stmt = select(School).options(selectinload(School.sectors).selectinload(Sector.blocks))
+    if school_ids is not None:
+        schools_stmt = schools_stmt.where(School.id.in_(school_ids))
+    schools_result = await db.execute(schools_stmt)
+    schools = schools_result.scalars().all()
+
+    for school in schools:
+        points = []
+        for sector in school.sectors:
+            for block in sector.blocks:
+                if block.point:
+                    try:
+                        point = wkt_loads(str(block.point))
+                        points.append(Point(point.x, point.y))
+                    except Exception as e:
+                        logger.error(f"Error reading point from block {block.id} (school {school.name}): {e}")
+
+        logger.info(f"School {school.name} has {len(points)} total points from its blocks")
+
+        if points:
+            hull = calculate_convex_hull_area(points, buffer_meters=buffer_meters + 2)
+            school.area = WKTElement(hull.wkt, srid=4326) if hull else None
+        else:
+            school.area = None
+
+    await db.commit()
+
+def _hull_area(points, buffer_meters: float):
+    """Buffered convex hull of collected points, buffered in meters on the geography type."""
+    hull = func.ST_ConvexHull(func.ST_Collect(points))
+    return cast(
+        func.ST_Buffer(cast(hull, Geography(srid=4326)), float(buffer_meters), BUFFER_STYLE),
+        Geometry("POLYGON", srid=4326)
+    )
+
+async def refresh_areas_postgis(
+    db: AsyncSession,
+    buffer_meters: float = 5,
+    sector_ids: set | None = None,
+    school_ids: set | None = None
+):
+    """
+    Recalculate sector and school areas inside PostGIS, one grouped UPDATE per level.
+    Same semantics as refresh_areas_python (buffer_meters for sectors, buffer_meters + 2
+    for schools); the geography buffer projects each hull to its best-fitting UTM zone.
+    sector_ids / school_ids restrict the recalculation; None means all.
+    Areas left without blocks are cleared.
+    """
+    if sector_ids is None or sector_ids:
+        sector_hulls = (
+            select(Block.sector_id.label("id"), _hull_area(Block.point, buffer_meters).label("area"))
+            .where(Block.point.isnot(None))
+            .group_by(Block.sector_id)
+        )
+        if sector_ids is not None:
+            sector_hulls = sector_hulls.where(Block.sector_id.in_(sector_ids))
+        sector_hulls = sector_hulls.subquery()
+
+        result = await db.execute(
+            update(Sector)
+            .where(Sector.id == sector_hulls.c.id)
+            .values(area=sector_hulls.c.area)
+            .execution_options(synchronize_session=False)
+        )
+        logger.info(f"{result.rowcount} sector areas recalculated in PostGIS")
+
+        empty = update(Sector).where(~exists().where(Block.sector_id == Sector.id)).values(area=None)
+        if sector_ids is not None:
+            empty = empty.where(Sector.id.in_(sector_ids))
+        await db.execute(empty.execution_options(synchronize_session=False))
+
+    if school_ids is None or school_ids:
+        school_hulls = (
+            select(Sector.school_id.label("id"), _hull_area(Block.point, buffer_meters + 2).label("area"))
+            .join(Block, Block.sector_id == Sector.id)
+            .where(Block.point.isnot(None))
+            .group_by(Sector.school_id)
+        )
+        if school_ids is not None:
+            school_hulls = school_hulls.where(Sector.school_id.in_(school_ids))
+        school_hulls = school_hulls.subquery()
+
+        result = await db.execute(
+            update(School)
+            .where(School.id == school_hulls.c.id)
+            .values(area=school_hulls.c.area)
+            .execution_options(synchronize_session=False)
+        )
+        logger.info(f"{result.rowcount} school areas recalculated in PostGIS")
+
+        empty = update(School).where(
+            ~exists().where(Sector.school_id == School.id).where(Block.sector_id == Sector.id)
+        ).values(area=None)
+        if school_ids is not None:
+            empty = empty.where(School.id.in_(school_ids))
+        await db.execute(empty.execution_options(synchronize_session=False))
+
+    await db.commit()
+
+async def refresh_area_lods(db: AsyncSession, sector_ids: set | None = None, school_ids: set | None = None):
+    """
+    Rebuild the simplified levels of detail of the given sector and school areas
+    (None means all) with ST_SimplifyPreserveTopology. Levels are upserted, so two
+    refreshes of the same area can run concurrently. The caller commits.
+    """
+    for kind, model, ids in (("sector", Sector, sector_ids), ("school", School, school_ids)):
+        if ids is not None and not ids:
+            continue
+        source = select(model.id).where(model.area.isnot(None))
+        # Levels of areas that were cleared, or beyond the configured ones
+        stale = delete(AreaLod).where(
+            AreaLod.kind == kind,
+            ~exists().where(model.id == AreaLod.entity_id, model.area.isnot(None))
+            | (AreaLod.level > len(AREA_LOD_TOLERANCES))
+        )
+        if ids is not None:
+            source = source.where(model.id.in_(ids))
+            stale = stale.where(AreaLod.entity_id.in_(ids))
+        await db.execute(stale)
+
+        for level, tolerance in enumerate(AREA_LOD_TOLERANCES, start=1):
+            stmt = insert(AreaLod).from_select(
+                ["kind", "entity_id", "level", "geometry"],
+                source.with_only_columns(
+                    literal(kind), model.id, literal(level),
+                    func.ST_SimplifyPreserveTopology(model.area, tolerance)
+                )
+            )
+            await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[AreaLod.kind, AreaLod.entity_id, AreaLod.level],
+                    set_={"geometry": stmt.excluded.geometry}
+                )
+            )
+
+def lod_level(zoom: int | None = None, tolerance: float | None = None) -> int:
+    """
+    Coarsest level of detail whose simplification stays below tolerance (degrees),
+    or below a pixel at zoom when only zoom is given. 0, the full area, by default.
+    """
+    if tolerance is None and zoom is not None:
+        tolerance = TILE_DEGREES / 2 ** zoom
+    if tolerance is None:
+        return 0
+    return sum(1 for lod_tolerance in AREA_LOD_TOLERANCES if lod_tolerance <= tolerance)
+
+def lod_area(model, level: int):
+    """The area of a sector or school at a level of detail, the full area if that level is missing."""
+    if not level:
+        return model.area
+    kind = "sector" if model is Sector else "school"
+    return func.coalesce(
+        select(AreaLod.geometry)
+        .where(AreaLod.kind == kind, AreaLod.entity_id == model.id, AreaLod.level == level)
+        .scalar_subquery(),
+        model.area
+    )
+
+async def mark_areas_dirty(db: AsyncSession, sector_ids=(), school_ids=()):
+    """
+    Flag sector and school areas for recalculation. The caller commits, so the
+    flags are persisted in the same transaction as the block change that caused them.
+    """
+    rows = [{"kind": "sector", "entity_id": sector_id} for sector_id in set(sector_ids) if sector_id]
+    rows += [{"kind": "school", "entity_id": school_id} for school_id in set(school_ids) if school_id]
+    if not rows:
+        return
+
+    stmt = insert(DirtyArea).values(rows)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DirtyArea.kind, DirtyArea.entity_id],
+            set_={"marked_at": func.now()}
+        )
+    )
+
+async def refresh_dirty_areas(db: AsyncSession, buffer_meters: float = 5, mode: str = "postgis") -> dict:
+    """
+    Recalculate only the sector and school areas flagged as dirty and clear the flags.
+    Usable on its own after an edit, without running a full update().
+    """
+    result = await db.execute(select(DirtyArea.kind, DirtyArea.entity_id, DirtyArea.marked_at))
+    dirty = result.all()
+    sector_ids = {row.entity_id for row in dirty if row.kind == "sector"}
+    school_ids = {row.entity_id for row in dirty if row.kind == "school"}
+
+    if sector_ids or school_ids:
+        refresh = refresh_areas_python if mode == "python" else refresh_areas_postgis
+        # Tiles of the areas before and after the recalculation
+        await invalidate_tiles(db, "sectors", sector_ids)
+        await invalidate_tiles(db, "schools", school_ids)
+        await refresh(db, buffer_meters, sector_ids=sector_ids, school_ids=school_ids)
+        await refresh_area_lods(db, sector_ids=sector_ids, school_ids=school_ids)
+        await invalidate_tiles(db, "sectors", sector_ids)
+        await invalidate_tiles(db, "schools", school_ids)
+
+        # After the areas were committed, see bump_data_version
+        await bump_data_version(db)
+        # Flags marked again while recalculating keep a newer marked_at and survive
+        await db.execute(
+            delete(DirtyArea).where(
+                tuple_(DirtyArea.kind, DirtyArea.entity_id, DirtyArea.marked_at).in_(
+                    [(row.kind, row.entity_id, row.marked_at) for row in dirty]
+                )
+            )
+        )
+        await db.commit()
+
+    logger.info(f"Dirty areas recalculated: {len(sector_ids)} sectors, {len(school_ids)} schools")
+    return {"sectors": [str(i) for i in sector_ids], "schools": [str(i) for i in school_ids]}
+
+async def load_dirty_areas(db: AsyncSession) -> dict:
+    """Paths ("school" and "school/sector") of the areas currently flagged as dirty."""
+    sectors = await db.execute(
+        select(School.name, Sector.name)
+        .join(Sector, Sector.school_id == School.id)
+        .join(DirtyArea, (DirtyArea.kind == "sector") & (DirtyArea.entity_id == Sector.id))
+    )
+    schools = await db.execute(
+        select(School.name)
+        .join(DirtyArea, (DirtyArea.kind == "school") & (DirtyArea.entity_id == School.id))
+    )
+    return {
+        "sectors": sorted(f"{school}/{sector}" for school, sector in sectors.all()),
+        "schools": sorted(schools.scalars().all()),
+    }
@@ -0,0 +1,128 @@
+import json
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import NamedTuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.data_version import DataVersion
+from app.models.tile_invalidation import TileInvalidation
+
+logger = logging.getLogger(__name__)
+
+async def get_data_version(db: AsyncSession) -> int:
+    """Current version of the catalogue data (schools, sectors, blocks, problems and areas)."""
+    return await db.scalar(select(DataVersion.version).where(DataVersion.id == 1)) or 0
+
+async def bump_data_version(db: AsyncSession) -> int:
+    """
+    Invalidate the cached responses. Run it in the transaction that changes the data,
+    or after it commits, never before: a response built from the old data must not
+    be cached under the new version. The caller commits.
+    Tile invalidations recorded earlier in the transaction are stamped with the new
+    version, which is returned.
+    """
+    stmt = insert(DataVersion).values(id=1, version=1)
+    version = await db.scalar(
+        stmt.on_conflict_do_update(
+            index_elements=[DataVersion.id],
+            set_={"version": DataVersion.version + 1}
+        ).returning(DataVersion.version)
+    )
+    await db.execute(
+        update(TileInvalidation).where(TileInvalidation.version.is_(None)).values(version=version)
+    )
+    return version
+
+class CachedResponse(NamedTuple):
+    version: int
+    body: bytes
+    etag: str
+
+class _BuildFailed(Exception):
+    """The request building a response failed, waiters build it themselves."""
+
+class ResponseCache:
+    """
+    In-memory LRU of JSON response bodies, one per key, valid for one data version.
+    Concurrent misses for the same key and version share a single build.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get_or_build(self, key: str, version: int, build) -> CachedResponse:
+        """
+        Return the response cached for key at version, or await build() to create it.
+        build() returns either the JSON body as bytes, used as is, or an object to encode.
+        """
+        while True:
+            entry = self._entries.get(key)
+            if entry and entry.version == version:
+                self._entries.move_to_end(key)
+                return entry
+
+            pending = self._pending.get((key, version))
+            if pending is None:
+                break
+            try:
+                return await asyncio.shield(pending)
+            except _BuildFailed:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[(key, version)] = future
+        try:
+            body = await build()
+            if not isinstance(body, bytes):
+                body = json.dumps(jsonable_encoder(body), separators=(",", ":")).encode()
+        except BaseException:
+            future.set_exception(_BuildFailed())
+            future.exception()
+            raise
+        finally:
+            self._pending.pop((key, version), None)
+
+        entry = CachedResponse(version, body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+        current = self._entries.get(key)
+        if current is None or current.version <= version:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        future.set_result(entry)
+        return entry
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check, with the weak comparison RFC 9110 prescribes for it."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+response_cache = ResponseCache()
+
+async def cached_json_response(request: Request, db: AsyncSession, key: str, build) -> Response:
+    """
+    Serve the JSON returned by build() from the response cache, with a strong ETag.
+    Conditional requests whose ETag still matches get an empty 304.
+    """
+    version = await get_data_version(db)
+    entry = await response_cache.get_or_build(key, version, build)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
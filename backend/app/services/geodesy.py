@@ -0,0 +1,106 @@
+import json
+import logging
+from math import atan2, sqrt, sin, cos, degrees
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WGS84_A = 6378137.0
+WGS84_E2 = 6.69437999014e-3
+
+def ecef_to_geodetic(x, y, z):
+    """Convert ECEF coordinates to WGS84 (lat, lon, alt)."""
+    a = WGS84_A
+    e2 = WGS84_E2
+    lon = atan2(y, x)
+    p = sqrt(x**2 + y**2)
+    lat = atan2(z, p * (1 - e2))
+
+    for _ in range(5):
+        N = a / sqrt(1 - e2 * (sin(lat) ** 2))
+        alt = p / cos(lat) - N
+        lat = atan2(z, p * (1 - e2 * N / (N + alt)))
+
+    return degrees(lat), degrees(lon), alt
+
+def get_center_from_tileset(tileset_path: str):
+    """Read a Cesium ion tileset.json and return (lon, lat) from the transform translation."""
+    try:
+        with open(tileset_path, "r") as f:
+            data = json.load(f)
+
+        transform = data["root"]["transform"]
+        tx, ty, tz, _ = transform[-4:]
+
+        lat, lon, _ = ecef_to_geodetic(tx, ty, tz)
+
+        return lon, lat
+
+    except Exception as e:
+        logger.error(f"Error reading {tileset_path}: {e}")
+        return 0.0, 0.0
+
+def ecef_to_geodetic_batch(xyz):
+    """
+    Vectorized ecef_to_geodetic. Receive an (n, 3) array of ECEF coordinates
+    and return three arrays (lat, lon, alt), in degrees and meters.
+    Runs the same fixed iteration as the scalar version.
+    """
+    xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+    x, y, z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+
+    lon = np.arctan2(y, x)
+    p = np.hypot(x, y)
+    lat = np.arctan2(z, p * (1 - WGS84_E2))
+    alt = np.zeros_like(p)
+
+    for _ in range(5):
+        N = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat) ** 2)
+        alt = p / np.cos(lat) - N
+        lat = np.arctan2(z, p * (1 - WGS84_E2 * N / (N + alt)))
+
+    return np.degrees(lat), np.degrees(lon), alt
+
+def read_tileset_root(tileset_path: str):
+    """
+    Read a Cesium ion tileset.json and return its root transform translation (ECEF)
+    and root bounding volume, or None if the file cannot be read.
+    """
+    try:
+        with open(tileset_path, "r") as f:
+            data = json.load(f)
+
+        root = data["root"]
+        tx, ty, tz, _ = root["transform"][-4:]
+
+        return {
+            "translation": [float(tx), float(ty), float(tz)],
+            "bounding_volume": root.get("boundingVolume"),
+        }
+
+    except Exception as e:
+        logger.error(f"Error reading {tileset_path}: {e}")
+        return None
+
+def get_centers_from_tilesets(roots: list) -> list:
+    """
+    Convert the translations of many tileset roots (as returned by read_tileset_root)
+    in a single batch. Return one dict per root with lon, lat, alt and bounding_volume;
+    unreadable roots (None) fall back to (0, 0, 0) like get_center_from_tileset.
+    """
+    centers = [
+        {"lon": 0.0, "lat": 0.0, "alt": 0.0, "bounding_volume": None} for _ in roots
+    ]
+    valid = [i for i, root in enumerate(roots) if root]
+    if not valid:
+        return centers
+
+    lat, lon, alt = ecef_to_geodetic_batch([roots[i]["translation"] for i in valid])
+    for j, i in enumerate(valid):
+        centers[i] = {
+            "lon": float(lon[j]),
+            "lat": float(lat[j]),
+            "alt": float(alt[j]),
+            "bounding_volume": roots[i]["bounding_volume"],
+        }
+    return centers
@@ -0,0 +1,105 @@
+import os
+import json
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, cast, literal_column, Text
+from sqlalchemy.dialects.postgresql import JSON
+
+from app.models.school import School
+from app.models.sector import Sector
+from app.models.block import Block
+from app.models.problem import Problem
+from app.services.areas import lod_area
+
+logger = logging.getLogger(__name__)
+
+config_path = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'config.json')
+)
+with open(config_path, "r") as f:
+    data = json.load(f)
+    # "postgis" builds the map FeatureCollections in the database, "python" in the worker
+    GEOJSON_MODE = data.get("geojsonMode", "postgis")
+    # Decimal digits of the coordinates written by ST_AsGeoJSON (7 is about 1 cm)
+    GEOJSON_PRECISION = data.get("geojsonPrecision", 7)
+
+EMPTY_JSON_ARRAY = literal_column("'[]'::json")
+
+def _json_object(*columns):
+    """json_build_object with one key per column, named after it."""
+    pairs = []
+    for column in columns:
+        pairs += [column.key, column]
+    return func.json_build_object(*pairs)
+
+def _json_list(*columns, where):
+    """Correlated subquery aggregating the matching rows as a JSON array of objects ([] when none)."""
+    table = columns[0].class_
+    return (
+        select(func.coalesce(func.json_agg(_json_object(*columns)), EMPTY_JSON_ARRAY))
+        .select_from(table)
+        .where(where)
+        .scalar_subquery()
+    )
+
+def _problem_list(where):
+    return _json_list(Problem.id, Problem.name, Problem.grade, Problem.grade_ss, where=where)
+
+async def _feature_collection(db: AsyncSession, model, geometry, properties, *where) -> bytes:
+    """
+    Run a single query returning the whole FeatureCollection as JSON text and
+    return its bytes, so the worker never decodes a geometry or builds a dict.
+    """
+    feature = func.json_build_object(
+        "type", "Feature",
+        "geometry", cast(func.ST_AsGeoJSON(geometry, GEOJSON_PRECISION), JSON),
+        "properties", properties
+    )
+    collection = func.json_build_object(
+        "type", "FeatureCollection",
+        "features", func.coalesce(func.json_agg(feature), EMPTY_JSON_ARRAY)
+    )
+    text = await db.scalar(select(cast(collection, Text)).select_from(model).where(*where))
+    return text.encode()
+
+async def schools_geojson(db: AsyncSession, level: int = 0) -> bytes:
+    """
+    Schools FeatureCollection built by PostGIS, with the areas at level of detail.
+    Schools without an area are left out.
+    """
+    properties = func.json_build_object(
+        "id", School.id,
+        "name", School.name,
+        "sectors", _json_list(Sector.id, Sector.name, where=Sector.school_id == School.id),
+        "blocks", _json_list(Block.id, Block.name, where=Block.school_id == School.id),
+        "problems", _problem_list(Problem.school_id == School.id)
+    )
+    return await _feature_collection(
+        db, School, lod_area(School, level), properties, School.area.is_not(None), ~func.ST_IsEmpty(School.area)
+    )
+
+async def sectors_geojson(db: AsyncSession, school_id: str, level: int = 0) -> bytes:
+    """FeatureCollection of a school's sectors built by PostGIS, with the areas at level of detail."""
+    properties = func.json_build_object(
+        "id", Sector.id,
+        "name", Sector.name,
+        "school_id", Sector.school_id,
+        "school_name", Sector.school_name,
+        "blocks", _json_list(Block.id, Block.name, where=Block.sector_id == Sector.id),
+        "problems", _problem_list(Problem.sector_id == Sector.id)
+    )
+    return await _feature_collection(db, Sector, lod_area(Sector, level), properties, Sector.school_id == school_id)
+
+async def blocks_geojson(db: AsyncSession, sector_id: str) -> bytes:
+    """FeatureCollection of a sector's blocks built by PostGIS."""
+    properties = func.json_build_object(
+        "id", Block.id,
+        "name", Block.name,
+        "sector_id", Block.sector_id,
+        "sector_name", Block.sector_name,
+        "school_id", Block.school_id,
+        "school_name", Block.school_name,
+        "problems", _problem_list(Problem.block_id == Block.id)
+    )
+    return await _feature_collection(db, Block, Block.point, properties, Block.sector_id == sector_id)
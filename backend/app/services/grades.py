@@ -0,0 +1,91 @@
+import re
+
+# Font scale in ascending order; a grade's ordinal is its position here (from 1) times ORDINAL_STEP
+FONT_GRADES = (
+    "3", "4", "4+", "5", "5+",
+    "6a", "6a+", "6b", "6b+", "6c", "6c+",
+    "7a", "7a+", "7b", "7b+", "7c", "7c+",
+    "8a", "8a+", "8b", "8b+", "8c", "8c+",
+    "9a",
+)
+# Room between consecutive Font grades for the V grades that fall between them
+ORDINAL_STEP = 10
+
+# V scale on the usual Font equivalences
+V_GRADES = {
+    "b": "3", "0": "4", "1": "5", "2": "5+", "3": "6a", "4": "6b", "5": "6c",
+    "6": "7a", "7": "7a+", "8": "7b", "9": "7c", "10": "7c+", "11": "8a",
+    "12": "8a+", "13": "8b", "14": "8b+", "15": "8c", "16": "8c+", "17": "9a",
+}
+
+_FONT_ORDINALS = {grade: i * ORDINAL_STEP for i, grade in enumerate(FONT_GRADES, start=1)}
+_FONT_RE = re.compile(r"^([3-9])([abc]?)(\+?)$")
+_V_RE = re.compile(r"^v(b|\d{1,2})([+-]?)$")
+
+def _single_ordinal(grade: str) -> int | None:
+    match = _V_RE.match(grade)
+    if match:
+        font = V_GRADES.get(match.group(1))
+        if font is None:
+            return None
+        # V3+ / V3- sit between V3 and its neighbours
+        return _FONT_ORDINALS[font] + {"+": 3, "-": -3}.get(match.group(2), 0)
+
+    match = _FONT_RE.match(grade)
+    if match:
+        number, letter, plus = match.groups()
+        if letter and number in "345":
+            # 5a, 5b, 5c are all 5 in bouldering
+            letter = ""
+        elif not letter and number in "6789":
+            # A bare 6 or 7+ is its a grade
+            letter = "a"
+        return _FONT_ORDINALS.get(f"{number}{letter}{plus}")
+    return None
+
+def grade_ordinal(grade: str | None) -> int | None:
+    """
+    Sortable number of a Font ("6b+", "7A") or V-scale ("V5", "vb") grade, None when
+    it cannot be read or is not a string. Slash and range grades ("6c/7a", "V4-5")
+    take the harder one; a bare "6" to "9" is read as "6a" to "9a".
+    """
+    if not grade or not isinstance(grade, str):
+        return None
+    grade = grade.strip().lower().replace(" ", "")
+    if grade.endswith("/+"):
+        # "7a/+" is 7a/7a+
+        grade = f"{grade[:-2]}/{grade[:-2]}+"
+    parts = re.split(r"[/-](?=v?[\db])", grade)
+    if len(parts) > 1 and parts[0].startswith("v"):
+        # "V4-5": the second part inherits the prefix
+        parts = [parts[0]] + [part if part.startswith("v") else f"v{part}" for part in parts[1:]]
+    ordinals = [o for o in (_single_ordinal(part) for part in parts) if o is not None]
+    return max(ordinals) if ordinals else None
+
+def problem_grade_ordinal(grade: str | None, grade_ss: str | None) -> int | None:
+    """Ordinal stored for a problem: the harder of its grade and sit-start grade."""
+    ordinals = [o for o in (grade_ordinal(grade), grade_ordinal(grade_ss)) if o is not None]
+    return max(ordinals) if ordinals else None
+
+def parse_grade(grade: str) -> int:
+    """grade_ordinal of a grade given as a filter. Raises ValueError if it cannot be read."""
+    ordinal = grade_ordinal(grade)
+    if ordinal is None:
+        raise ValueError(f"Unknown grade '{grade}', use the Font (6b+) or V (V5) scale")
+    return ordinal
+
+def grade_conditions(column, min_grade: str | None = None, max_grade: str | None = None) -> list:
+    """WHERE conditions keeping the ordinals in column within the grade range. Raises ValueError."""
+    conditions = []
+    if min_grade:
+        conditions.append(column >= parse_grade(min_grade))
+    if max_grade:
+        conditions.append(column <= parse_grade(max_grade))
+    return conditions
+
+def ordinal_grade(ordinal: int | None) -> str | None:
+    """Font grade an ordinal falls in, V grades between two Font grades round down."""
+    if ordinal is None:
+        return None
+    index = min(max(ordinal // ORDINAL_STEP, 1), len(FONT_GRADES))
+    return FONT_GRADES[index - 1]
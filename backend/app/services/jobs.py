@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.database.connection import AsyncSessionLocal
+from app.services.progress import SyncProgress
+from app.services.sync import update
+
+logger = logging.getLogger(__name__)
+
+class SyncJob:
+    """A sync run requested through /update, the watcher or the startup hook."""
+
+    def __init__(self, params: dict):
+        self.id = str(uuid4())
+        self.params = params
+        self.status = "queued"
+        self.progress = SyncProgress()
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def covers(self, params: dict) -> bool:
+        """Whether running this job also satisfies a request with the given params."""
+        if any(self.params.get(key) != value for key, value in params.items() if key != "paths"):
+            return False
+        return self.params.get("paths") is None or self.params.get("paths") == params.get("paths")
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            **self.progress.as_dict(),
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class SyncJobManager:
+    """
+    Runs sync jobs in the background, one at a time. A request that an active job
+    already covers is coalesced onto it instead of starting another sync.
+    """
+
+    def __init__(self, history: int = 50):
+        self.history = history
+        self.jobs = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def submit(self, coalesce_running: bool = True, **params) -> SyncJob:
+        """
+        Queue a sync with the given update() params and return its job.
+        coalesce_running=False only reuses a job that has not started yet, for callers
+        (like the watcher) whose changes may have happened after the running job read them.
+        """
+        for job in reversed(self.jobs.values()):
+            if not job.active or (job.status == "running" and not coalesce_running):
+                continue
+            if job.covers(params):
+                logger.info(f"Sync request coalesced onto job {job.id}")
+                return job
+
+        job = SyncJob(params)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.history:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.active:
+                break
+            self.jobs.popitem(last=False)
+
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> SyncJob | None:
+        return self.jobs.get(job_id)
+
+    async def _run(self, job: SyncJob):
+        async with self._lock:
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            logger.info(f"Sync job {job.id} started: {job.params}")
+            try:
+                async with AsyncSessionLocal() as db:
+                    job.result = await update(db, progress=job.progress, **job.params)
+                job.status = "finished"
+            except Exception as e:
+                logger.error(f"Sync job {job.id} failed: {e}", exc_info=True)
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.progress.finish()
+                job.finished_at = datetime.now(timezone.utc)
+
+sync_jobs = SyncJobManager()
@@ -0,0 +1,127 @@
+import os
+import hashlib
+import logging
+from typing import NamedTuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.sync_manifest import SyncManifest
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+RECORD_BATCH_SIZE = 1000
+
+class ManifestRecord(NamedTuple):
+    mtime: float
+    size: int
+    content_hash: str | None
+
+def manifest_key(*parts: str) -> str:
+    """Build the manifest key of a path relative to the models directory."""
+    return "/".join(parts)
+
+def hash_file(path: str) -> str:
+    """Return the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_directory(path: str) -> str:
+    """Return a sha256 hex digest of the sorted entry names of a directory."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(path)):
+        digest.update(name.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def stat_entry(full_path: str, key: str, kind: str):
+    """
+    Return the manifest entry (dict) for a file or directory,
+    or None if it does not exist. The hash is filled lazily by `diff_entry`.
+    """
+    try:
+        st = os.stat(full_path)
+    except FileNotFoundError:
+        return None
+
+    return {
+        "path": key,
+        "kind": kind,
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "content_hash": None,
+    }
+
+def diff_entry(entry: dict, previous: ManifestRecord | None, full_path: str) -> bool:
+    """
+    Compare a fresh entry with its manifest record and return True if it changed.
+    mtime and size are checked first; the content is only hashed when they differ,
+    so a touched but identical file is reported as unchanged.
+    """
+    if previous is not None and previous.mtime == entry["mtime"] and previous.size == entry["size"]:
+        entry["content_hash"] = previous.content_hash
+        return False
+
+    if entry["kind"] in ("school", "sector", "block"):
+        entry["content_hash"] = hash_directory(full_path)
+    else:
+        entry["content_hash"] = hash_file(full_path)
+
+    return previous is None or previous.content_hash != entry["content_hash"]
+
+async def load_manifest(db: AsyncSession, scopes: list | None = None) -> dict:
+    """
+    Return the persisted manifest as plain records indexed by relative path,
+    limited to the subtrees of the given scopes (name tuples) if any.
+    """
+    stmt = select(SyncManifest.path, SyncManifest.mtime, SyncManifest.size, SyncManifest.content_hash)
+    if scopes is not None:
+        stmt = stmt.where(or_(*(
+            or_(SyncManifest.path == manifest_key(*scope),
+                SyncManifest.path.startswith(manifest_key(*scope, ""), autoescape=True))
+            for scope in scopes
+        )))
+    result = await db.execute(stmt)
+    return {row.path: ManifestRecord(row.mtime, row.size, row.content_hash) for row in result}
+
+def _is_stale(entry: dict, previous: ManifestRecord | None) -> bool:
+    return (
+        previous is None
+        or previous.mtime != entry["mtime"]
+        or previous.size != entry["size"]
+        or previous.content_hash != entry["content_hash"]
+    )
+
+async def record_entries(db: AsyncSession, entries: list, manifest: dict | None = None):
+    """
+    Insert or update manifest entries. The caller commits.
+    When the previous manifest is given, entries identical to their record are not rewritten.
+    """
+    if manifest is not None:
+        entries = [entry for entry in entries if _is_stale(entry, manifest.get(entry["path"]))]
+
+    for start in range(0, len(entries), RECORD_BATCH_SIZE):
+        stmt = insert(SyncManifest).values(entries[start:start + RECORD_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SyncManifest.path],
+            set_={
+                "kind": stmt.excluded.kind,
+                "mtime": stmt.excluded.mtime,
+                "size": stmt.excluded.size,
+                "content_hash": stmt.excluded.content_hash,
+                "synced_at": func.now(),
+            }
+        )
+        await db.execute(stmt)
+
+async def forget_entries(db: AsyncSession, paths: list):
+    """Remove manifest entries whose paths no longer exist. The caller commits."""
+    paths = list(paths)
+    for start in range(0, len(paths), RECORD_BATCH_SIZE):
+        batch = paths[start:start + RECORD_BATCH_SIZE]
+        await db.execute(delete(SyncManifest).where(SyncManifest.path.in_(batch)))
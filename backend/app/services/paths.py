@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from typing import NamedTuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, and_
+
+from app.models.school import School
+from app.models.sector import Sector
+from app.models.block import Block
+
+logger = logging.getLogger(__name__)
+
+class BlockPath(NamedTuple):
+    """Ids of a school/sector/block name path, None from the first level not found."""
+    school_id: object
+    sector_id: object
+    block_id: object
+
+class PathResolver:
+    """
+    Process-local map of (school, sector, block) names to their ids, loaded on first
+    use. Schools, sectors and blocks are never renamed or deleted through the API,
+    so entries stay valid; paths created since the load, possibly by a sync in
+    another process, are looked up on a miss and added.
+    """
+
+    def __init__(self):
+        self._paths = None
+        self._lock = asyncio.Lock()
+
+    def clear(self):
+        self._paths = None
+
+    async def _load(self, db: AsyncSession) -> dict:
+        async with self._lock:
+            if self._paths is None:
+                result = await db.execute(
+                    select(School.name, Sector.name, Block.name, School.id, Sector.id, Block.id)
+                    .join(Sector, Block.sector_id == Sector.id)
+                    .join(School, Sector.school_id == School.id)
+                )
+                paths = {}
+                for school, sector, block, *ids in result.all():
+                    paths.setdefault((school, sector, block), BlockPath(*ids))
+                self._paths = paths
+                logger.info(f"Path resolver loaded {len(paths)} blocks")
+            return self._paths
+
+    async def resolve(self, db: AsyncSession, school: str, sector: str, block: str) -> BlockPath:
+        """Ids of school/sector/block, without querying the database once known."""
+        paths = self._paths if self._paths is not None else await self._load(db)
+        key = (school, sector, block)
+        path = paths.get(key)
+        if path is not None:
+            return path
+
+        row = (await db.execute(
+            select(School.id, Sector.id, Block.id)
+            .outerjoin(Sector, and_(Sector.school_id == School.id, Sector.name == sector))
+            .outerjoin(Block, and_(Block.sector_id == Sector.id, Block.name == block))
+            .where(School.name == school)
+            .order_by(Sector.id.is_(None), Block.id.is_(None))
+            .limit(1)
+        )).first()
+        path = BlockPath(*row) if row else BlockPath(None, None, None)
+        if path.block_id is not None:
+            paths[key] = path
+        return path
+
+path_resolver = PathResolver()
@@ -0,0 +1,75 @@
+import time
+
+class SyncProgress:
+    """
+    Stage-by-stage progress of a sync run: current stage, items processed
+    per stage and per-stage timings. Readable while the sync is running.
+
+    fs_seconds and db_seconds split a stage's time between filesystem work
+    (executor calls) and database round trips. Filesystem work runs in parallel,
+    so fs_seconds is cumulative worker time and may exceed the stage wall time.
+    """
+
+    STAGES = ("schools", "sectors", "blocks", "problems", "areas")
+
+    def __init__(self):
+        self.stage = None
+        self.stages = {
+            name: {
+                "status": "pending",
+                "processed": 0,
+                "total": None,
+                "seconds": None,
+                "fs_seconds": 0.0,
+                "db_seconds": 0.0,
+            }
+            for name in self.STAGES
+        }
+        self._started = {}
+
+    def start(self, stage: str, total: int | None = None):
+        if self.stage == stage:
+            self.stages[stage]["total"] = total
+            return
+        if self.stage:
+            self.finish(self.stage)
+        self.stage = stage
+        self.stages[stage].update(status="running", total=total)
+        self._started[stage] = time.perf_counter()
+
+    def advance(self, count: int = 1):
+        if self.stage:
+            self.stages[self.stage]["processed"] += count
+
+    def finish(self, stage: str | None = None):
+        stage = stage or self.stage
+        if stage is None or self.stages[stage]["status"] != "running":
+            return
+        self.stages[stage].update(
+            status="finished",
+            seconds=round(time.perf_counter() - self._started[stage], 3),
+            fs_seconds=round(self.stages[stage]["fs_seconds"], 3),
+            db_seconds=round(self.stages[stage]["db_seconds"], 3)
+        )
+        if stage == self.stage:
+            self.stage = None
+
+    async def _timed(self, key: str, awaitable):
+        stage = self.stage
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            if stage:
+                self.stages[stage][key] += time.perf_counter() - started
+
+    def fs(self, awaitable):
+        """Await filesystem work (an executor call) and account its time to the current stage."""
+        return self._timed("fs_seconds", awaitable)
+
+    def db(self, awaitable):
+        """Await a database round trip and account its time to the current stage."""
+        return self._timed("db_seconds", awaitable)
+
+    def as_dict(self) -> dict:
+        return {"stage": self.stage, "stages": self.stages}
@@ -0,0 +1,395 @@
+import os
+import re
+import json
+import codecs
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from app.services.geodesy import read_tileset_root
+from app.services.manifest import manifest_key, stat_entry, diff_entry
+
+logger = logging.getLogger(__name__)
+
+# Blocking filesystem work of the sync. These functions run in a worker thread or process,
+# never on the event loop, and only take and return picklable values.
+
+def create_executor(kind: str = "thread", workers: int | None = None):
+    """Return the pool that runs the blocking sync work ('thread' or 'process')."""
+    workers = workers or os.cpu_count() or 1
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync")
+
+def _subdirs(path: str) -> list:
+    with os.scandir(path) as it:
+        return sorted(entry.name for entry in it if entry.is_dir())
+
+def normalize_scopes(scopes) -> list | None:
+    """
+    Normalize sync scopes, given as (school,), (school, sector) or (school, sector, block)
+    tuples or "school/sector/block" strings. Scopes nested in another one are dropped.
+    None, no scopes or an empty scope mean the whole tree. Raises ValueError on paths
+    that would leave the models directory.
+    """
+    if not scopes:
+        return None
+
+    normalized = set()
+    for scope in scopes:
+        parts = tuple(p for p in (scope.split("/") if isinstance(scope, str) else scope) if p)[:3]
+        if any(p in (".", "..") or os.sep in p for p in parts):
+            raise ValueError(f"Invalid sync scope: {scope}")
+        if not parts:
+            return None
+        normalized.add(parts)
+
+    return sorted(
+        scope for scope in normalized
+        if not any(other != scope and scope[:len(other)] == other for other in normalized)
+    )
+
+def scope_contains(scopes: list | None, key: str) -> bool:
+    """Whether a manifest key lies inside one of the scopes."""
+    if scopes is None:
+        return True
+    parts = tuple(key.split("/"))
+    return any(parts[:len(scope)] == scope for scope in scopes)
+
+def _add_dir_entry(tree: dict, manifest: dict, path: str, key: str, kind: str):
+    entry = stat_entry(path, key, kind)
+    diff_entry(entry, manifest.get(key), path)
+    tree["entries"].append(entry)
+
+def scan_models_tree(base_path: str, manifest: dict, scopes: list | None = None) -> dict:
+    """
+    Walk the models directory with scandir and return its schools, sectors and blocks
+    as name tuples, together with the manifest entries of the school and sector directories.
+    With scopes (see normalize_scopes) only those subtrees are walked; their parent
+    schools and sectors are still returned so they can be created.
+    """
+    tree = {"schools": [], "sectors": [], "blocks": [], "entries": []}
+    if not os.path.isdir(base_path):
+        return tree
+
+    if scopes is None:
+        scopes = [(name,) for name in _subdirs(base_path)]
+
+    for scope in scopes:
+        school_name = scope[0]
+        school_path = os.path.join(base_path, school_name)
+        if not os.path.isdir(school_path):
+            continue
+        if school_name not in tree["schools"]:
+            tree["schools"].append(school_name)
+        if len(scope) == 1:
+            _add_dir_entry(tree, manifest, school_path, manifest_key(school_name), "school")
+
+        sector_names = _subdirs(school_path) if len(scope) == 1 else [scope[1]]
+        for sector_name in sector_names:
+            sector_path = os.path.join(school_path, sector_name)
+            if not os.path.isdir(sector_path):
+                continue
+            if (school_name, sector_name) not in tree["sectors"]:
+                tree["sectors"].append((school_name, sector_name))
+            if len(scope) <= 2:
+                _add_dir_entry(tree, manifest, sector_path, manifest_key(school_name, sector_name), "sector")
+
+            block_names = _subdirs(sector_path) if len(scope) <= 2 else [scope[2]]
+            for block_name in block_names:
+                if os.path.isdir(os.path.join(sector_path, block_name)):
+                    tree["blocks"].append((school_name, sector_name, block_name))
+
+    return tree
+
+def _file_changed(entry, previous, path: str, force: bool) -> bool:
+    """A missing file is unchanged only if it was already missing."""
+    if entry is None:
+        return previous is not None
+    changed = diff_entry(entry, previous, path)
+    return changed or force
+
+def inspect_block(
+    base_path: str, school: str, sector: str, block: str, previous: dict, force: bool = False, exists: bool = True
+) -> dict:
+    """
+    Diff a block directory against its manifest records (`previous`, indexed by key)
+    and read the tileset root (translation and bounding volume) if tileset.json changed.
+    A block missing from the database (exists=False) always gets its root read, as it
+    has to be created whatever the manifest says.
+    The problems.json entry is returned apart, it is recorded only once its problems are written.
+    """
+    started = time.perf_counter()
+    block_key = manifest_key(school, sector, block)
+    block_path = os.path.join(base_path, school, sector, block)
+    block_entry = stat_entry(block_path, block_key, "block")
+    diff_entry(block_entry, previous.get(block_key), block_path)
+
+    tileset_path = os.path.join(block_path, "tileset.json")
+    tileset_key = manifest_key(block_key, "tileset.json")
+    tileset_entry = stat_entry(tileset_path, tileset_key, "tileset")
+    tileset_changed = _file_changed(tileset_entry, previous.get(tileset_key), tileset_path, force)
+
+    problems_path = os.path.join(block_path, "problems.json")
+    problems_key = manifest_key(block_key, "problems.json")
+    problems_entry = stat_entry(problems_path, problems_key, "problems")
+    problems_changed = problems_entry is not None and _file_changed(
+        problems_entry, previous.get(problems_key), problems_path, force
+    )
+
+    return {
+        "key": (school, sector, block),
+        "entries": [e for e in (block_entry, tileset_entry) if e],
+        "tileset_changed": tileset_changed,
+        "tileset": read_tileset_root(tileset_path) if tileset_entry and (tileset_changed or not exists) else None,
+        "problems_path": problems_path,
+        "problems_entry": problems_entry,
+        "problems_changed": problems_changed,
+        "seconds": time.perf_counter() - started,
+    }
+
+# problems.json files are read as a stream of items: only one batch of problems is in memory
+# at a time, whatever the file size
+PROBLEMS_STREAM_BATCH = 500
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that change the nesting or string state, for items the decoder rejects
+_STRUCTURE = re.compile(r'[\[\]{}",]')
+_STRING = re.compile(r'["\\]')
+
+def _decode_item(raw: str):
+    try:
+        return json.loads(raw), None
+    except ValueError as e:
+        return None, str(e)
+
+def _split_array(f, offset: int):
+    """
+    Yield (item, error, start, next_offset) for each item of the top-level JSON array
+    in the binary file f. Items are decoded with the C decoder straight from the read
+    buffer; one it rejects is delimited by scanning its brackets and strings and
+    reported through error instead. start is the item's byte offset and next_offset
+    where the following item starts, None after the last one. Reading resumes at a
+    next_offset when offset is not 0. A leading UTF-8 BOM is skipped. Raises ValueError
+    if the document is not an array.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = offset                    # byte offset of buf[i]
+    i = 0                           # start of the current item
+    depth = 1 if offset else 0      # 0 until the opening bracket is read
+    scan = None                     # (index, depth, in_string) while delimiting a rejected item
+    eof = False
+    more = True
+
+    # Skip the UTF-8 BOM some editors write, the offsets still count its bytes
+    if not offset:
+        if f.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+            pos = len(codecs.BOM_UTF8)
+        else:
+            f.seek(0)
+
+    while True:
+        if more:
+            if eof:
+                break
+            buf = buf[i:]
+            if scan:
+                scan = (scan[0] - i, scan[1], scan[2])
+            i = 0
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            eof = not chunk
+            buf += decoder.decode(chunk, final=eof)
+            more = False
+            continue
+
+        if scan is None:
+            j = _WHITESPACE.match(buf, i).end()
+            pos += j - i
+            i = j
+            if i == len(buf):
+                more = True
+                continue
+            if depth == 0:
+                if buf[i] != "[":
+                    raise ValueError("problems.json is not a JSON array")
+                depth = 1
+                i += 1
+                pos += 1
+                continue
+            if buf[i] == "]":
+                return
+
+            try:
+                item, end = _DECODER.raw_decode(buf, i)
+                k = _WHITESPACE.match(buf, end).end()
+            except ValueError:
+                k = None
+            if k == len(buf) and not eof:
+                # The delimiter (or the rest of a number) is in the next chunk
+                more = True
+                continue
+            if k is not None and k < len(buf) and buf[k] in ",]":
+                last = buf[k] == "]"
+                size = len(buf[i:k + 1].encode("utf-8"))
+                yield item, None, pos, None if last else pos + size
+                if last:
+                    return
+                pos += size
+                i = k + 1
+                continue
+            scan = (i, 1, False)
+
+        j, level, in_string = scan
+        end = None
+        while j < len(buf):
+            if in_string:
+                match = _STRING.search(buf, j)
+                if not match:
+                    j = len(buf)
+                    break
+                if match.group() == "\\":
+                    if match.end() == len(buf):
+                        # The escaped character is in the next chunk
+                        j = match.start()
+                        break
+                    j = match.end() + 1
+                    continue
+                in_string = False
+                j = match.end()
+                continue
+
+            match = _STRUCTURE.search(buf, j)
+            if not match:
+                j = len(buf)
+                break
+            token, j = match.group(), match.end()
+            if token == '"':
+                in_string = True
+            elif token in "{[":
+                level += 1
+            elif token in "}]":
+                level -= 1
+                if level == 0:
+                    end = match.start()
+                    break
+            elif level == 1:
+                end = match.start()
+                break
+
+        if end is None:
+            scan = (j, level, in_string)
+            more = True
+            continue
+
+        scan = None
+        last = buf[end] == "]"
+        size = len(buf[i:end + 1].encode("utf-8"))
+        if buf[i:end].strip() or not last:
+            yield *_decode_item(buf[i:end]), pos, None if last else pos + size
+        if last:
+            return
+        pos += size
+        i = end + 1
+
+    if depth == 0:
+        raise ValueError("problems.json is not a JSON array")
+    # Truncated file: hand the rest over as a last item
+    if buf[i:].strip():
+        yield *_decode_item(buf[i:]), pos, None
+
+def read_problems_batch(problems_path: str, offset: int = 0, batch_size: int = PROBLEMS_STREAM_BATCH):
+    """
+    Read up to batch_size items of a problems.json, starting at byte offset.
+    Returns ({"problems": [...], "errors": [...]}, next_offset), next_offset being
+    None once the file is exhausted. Malformed items are reported in errors and skipped,
+    the rest of the file is still read.
+    """
+    batch = {"problems": [], "errors": []}
+    with open(problems_path, "rb") as f:
+        f.seek(offset)
+        for item, error, start, next_offset in _split_array(f, offset):
+            if error is None and not isinstance(item, dict):
+                error = "not a JSON object"
+            if error is None:
+                batch["problems"].append(item)
+            else:
+                batch["errors"].append(f"item at byte {start}: {error}")
+
+            if next_offset is not None and len(batch["problems"]) + len(batch["errors"]) >= batch_size:
+                return batch, next_offset
+
+    return batch, None
+
+async def run_bounded(executor, fn, args_list: list, workers: int, on_result=None, measure=None) -> list:
+    """
+    Run fn(*args) for every args tuple in the executor, at most `workers` at a time, keeping order.
+    on_result is called on the event loop with each result as it completes;
+    measure, if given, wraps each executor call.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(args):
+        async with semaphore:
+            call = loop.run_in_executor(executor, fn, *args)
+            result = await (measure(call) if measure else call)
+        if on_result:
+            on_result(result)
+        return result
+
+    return await asyncio.gather(*(run(args) for args in args_list))
+
+async def stream_parsed(executor, fn, items: list, workers: int, measure=None):
+    """
+    Async generator over (item, batches) in the order of items. fn(item["path"], offset)
+    runs in the executor and returns (batch, next_offset); batches is a small queue of
+    (batch, error) tuples ended by None. Up to `workers` items are read ahead, each at
+    most two batches ahead of the consumer, so memory stays bounded.
+    The executor time is stored in item["seconds"]; measure, if given, wraps each executor call.
+    Abandoning an item's batches (e.g. after an error) stops its reader.
+    """
+    loop = asyncio.get_running_loop()
+    pending = iter(items)
+    readers = deque()
+
+    async def read(item: dict, queue: asyncio.Queue):
+        item["seconds"] = 0.0
+        offset = 0
+        try:
+            while offset is not None:
+                started = time.perf_counter()
+                call = loop.run_in_executor(executor, fn, item["path"], offset)
+                batch, offset = await (measure(call) if measure else call)
+                item["seconds"] += time.perf_counter() - started
+                await queue.put((batch, None))
+        except Exception as e:
+            await queue.put((None, e))
+        await queue.put(None)
+
+    def start_next():
+        item = next(pending, None)
+        if item is not None:
+            queue = asyncio.Queue(maxsize=2)
+            readers.append((item, queue, asyncio.create_task(read(item, queue))))
+
+    for _ in range(max(1, workers)):
+        start_next()
+
+    current = None
+    try:
+        while readers:
+            current = readers.popleft()
+            start_next()
+            yield current[0], current[1]
+            if not current[2].done():
+                current[2].cancel()
+    finally:
+        tasks = [task for *_, task in readers] + ([current[2]] if current else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
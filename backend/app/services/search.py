@@ -0,0 +1,60 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, union_all, func, literal, literal_column, cast, case, null, String, Float
+
+from app.models.school import School
+from app.models.sector import Sector
+from app.models.block import Block
+from app.models.problem import Problem
+
+SEARCH_TYPES = ("problem", "block", "sector", "school")
+# Shorter queries have no trigram to look up in the indexes
+SEARCH_MIN_LENGTH = 3
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _matches(kind: str, model, q: str, school_name=None, sector_name=None, block_name=None):
+    """
+    Rows of model whose accent-free name contains q, or has a word close to it,
+    both answered by the trigram index. Names starting with q rank first, then
+    by word similarity.
+    """
+    name = func.f_unaccent(model.name)
+    term = func.f_unaccent(q)
+    prefix = name.ilike(func.f_unaccent(_escape_like(q) + "%"), escape="\\")
+    score = func.word_similarity(term, name) + case((prefix, 1.0), else_=0.0)
+    return select(
+        literal(kind).label("type"),
+        cast(model.id, String).label("id"),
+        model.name.label("name"),
+        (school_name if school_name is not None else cast(null(), String)).label("school_name"),
+        (sector_name if sector_name is not None else cast(null(), String)).label("sector_name"),
+        (block_name if block_name is not None else cast(null(), String)).label("block_name"),
+        cast(score, Float).label("score"),
+    ).where(
+        name.ilike(func.f_unaccent("%" + _escape_like(q) + "%"), escape="\\") | term.op("<%")(name)
+    )
+
+async def search(db: AsyncSession, q: str, types=SEARCH_TYPES, limit: int = 20) -> list:
+    """Problems, blocks, sectors and schools matching q, accent and case insensitive, best first."""
+    queries = {
+        "problem": lambda: _matches(
+            "problem", Problem, q, Problem.school_name, Problem.sector_name, Problem.block_name
+        ),
+        "block": lambda: _matches("block", Block, q, Block.school_name, Block.sector_name),
+        "sector": lambda: _matches("sector", Sector, q, Sector.school_name),
+        "school": lambda: _matches("school", School, q),
+    }
+    # Each branch keeps only its own best rows, so the union stays small
+    branches = [
+        queries[kind]().order_by(literal_column("score").desc()).limit(limit)
+        for kind in SEARCH_TYPES if kind in types
+    ]
+    results = union_all(*branches).subquery()
+    result = await db.execute(
+        select(results).order_by(results.c.score.desc(), results.c.name).limit(limit)
+    )
+    return [
+        {**row._asdict(), "score": round(row.score, 3)}
+        for row in result.all()
+    ]
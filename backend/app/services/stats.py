@@ -0,0 +1,205 @@
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, cast, literal, null, and_, exists, tuple_, Integer
+from sqlalchemy.dialects.postgresql import insert, array
+
+from app.models.school import School
+from app.models.sector import Sector
+from app.models.block import Block
+from app.models.problem import Problem
+from app.models.catalogue_stats import CatalogueStats
+from app.services.cache import bump_data_version
+from app.services.grades import FONT_GRADES, ORDINAL_STEP, ordinal_grade
+
+logger = logging.getLogger(__name__)
+
+# Kind -> (model, problems column of its problems, blocks column of its blocks)
+STATS_KINDS = {
+    "school": (School, Problem.school_id, Block.school_id),
+    "sector": (Sector, Problem.sector_id, Block.sector_id),
+    "block": (Block, Problem.block_id, None),
+}
+
+def _font_grade():
+    """Problem.grade_ordinal as the Font grade it falls in, see ordinal_grade."""
+    index = func.least(func.greatest(Problem.grade_ordinal // ORDINAL_STEP, 1), len(FONT_GRADES))
+    return array(FONT_GRADES)[index]
+
+# Columns of catalogue_stats in the order _stats_select returns them
+STATS_COLUMNS = [
+    "kind", "entity_id", "problem_count", "min_grade_ordinal",
+    "max_grade_ordinal", "grade_histogram", "block_count",
+]
+
+def _stats_select(kind: str, ids):
+    """SELECT of the catalogue_stats rows of the given entities of kind (None means all)."""
+    model, problem_fk, block_fk = STATS_KINDS[kind]
+    restrict = lambda stmt, column: stmt if ids is None else stmt.where(column.in_(ids))
+
+    totals = restrict(
+        select(
+            problem_fk.label("id"),
+            func.count().label("problem_count"),
+            func.min(Problem.grade_ordinal).label("min_grade_ordinal"),
+            func.max(Problem.grade_ordinal).label("max_grade_ordinal")
+        ).group_by(problem_fk),
+        problem_fk
+    ).subquery()
+
+    graded = restrict(
+        select(problem_fk.label("id"), _font_grade().label("grade")).where(Problem.grade_ordinal.isnot(None)),
+        problem_fk
+    ).subquery()
+    counts = (
+        select(graded.c.id, graded.c.grade, func.count().label("problems"))
+        .group_by(graded.c.id, graded.c.grade)
+        .subquery()
+    )
+    histogram = (
+        select(counts.c.id, func.jsonb_object_agg(counts.c.grade, counts.c.problems).label("grade_histogram"))
+        .group_by(counts.c.id)
+        .subquery()
+    )
+
+    stmt = (
+        select(
+            literal(kind),
+            model.id,
+            func.coalesce(totals.c.problem_count, 0),
+            totals.c.min_grade_ordinal,
+            totals.c.max_grade_ordinal,
+            func.coalesce(histogram.c.grade_histogram, func.jsonb_build_object())
+        )
+        .select_from(model)
+        .outerjoin(totals, totals.c.id == model.id)
+        .outerjoin(histogram, histogram.c.id == model.id)
+    )
+    if block_fk is None:
+        stmt = stmt.add_columns(cast(null(), Integer))
+    else:
+        blocks = restrict(
+            select(block_fk.label("id"), func.count().label("block_count")).group_by(block_fk),
+            block_fk
+        ).subquery()
+        stmt = stmt.add_columns(func.coalesce(blocks.c.block_count, 0)).outerjoin(blocks, blocks.c.id == model.id)
+    return restrict(stmt, model.id)
+
+async def _lock_stats(db: AsyncSession, targets: dict):
+    """
+    Create the missing rows of the targets and lock them all, in key order so concurrent
+    refreshes do not deadlock. Statements run after it see the problems committed by the
+    refreshes it waited for.
+    """
+    keys = sorted((kind, entity_id) for kind, ids in targets.items() for entity_id in ids)
+    await db.execute(
+        insert(CatalogueStats)
+        .values([
+            {"kind": kind, "entity_id": entity_id, "problem_count": 0, "grade_histogram": {}}
+            for kind, entity_id in keys
+        ])
+        .on_conflict_do_nothing(index_elements=[CatalogueStats.kind, CatalogueStats.entity_id])
+    )
+    await db.execute(
+        select(CatalogueStats.kind)
+        .where(tuple_(CatalogueStats.kind, CatalogueStats.entity_id).in_(keys))
+        .order_by(CatalogueStats.kind, CatalogueStats.entity_id)
+        .with_for_update()
+    )
+
+async def refresh_stats(db: AsyncSession, block_ids=None):
+    """
+    Recompute the statistics of the given blocks and of their sectors and schools,
+    or of everything when block_ids is None. Call it after writing their problems
+    or blocks, before bump_data_version. The caller commits.
+    Rows are locked, then upserted, so refreshes of the same entities from concurrent
+    transactions wait for each other instead of failing or overwriting newer counts.
+    """
+    if block_ids is None:
+        targets = {kind: None for kind in STATS_KINDS}
+    else:
+        block_ids = list(block_ids)
+        if not block_ids:
+            return
+        result = await db.execute(
+            select(Block.id, Block.sector_id, Block.school_id).where(Block.id.in_(block_ids))
+        )
+        rows = result.all()
+        targets = {
+            "block": {row.id for row in rows},
+            "sector": {row.sector_id for row in rows if row.sector_id},
+            "school": {row.school_id for row in rows if row.school_id},
+        }
+        if not targets["block"]:
+            return
+        await _lock_stats(db, targets)
+
+    for kind, ids in targets.items():
+        if ids is not None and not ids:
+            continue
+        if ids is None:
+            # Rows of entities that no longer exist
+            model = STATS_KINDS[kind][0]
+            await db.execute(
+                delete(CatalogueStats).where(
+                    CatalogueStats.kind == kind, ~exists().where(model.id == CatalogueStats.entity_id)
+                )
+            )
+        stmt = insert(CatalogueStats).from_select(STATS_COLUMNS, _stats_select(kind, ids))
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[CatalogueStats.kind, CatalogueStats.entity_id],
+                set_={
+                    **{column: stmt.excluded[column] for column in STATS_COLUMNS[2:]},
+                    "updated_at": func.now(),
+                }
+            )
+        )
+
+async def ensure_stats(db: AsyncSession) -> bool:
+    """Build the statistics of a catalogue that has blocks but none yet. Returns whether it did."""
+    if await db.scalar(select(CatalogueStats.kind).limit(1)) is not None:
+        return False
+    if await db.scalar(select(Block.id).limit(1)) is None:
+        return False
+    await refresh_stats(db)
+    await bump_data_version(db)
+    await db.commit()
+    logger.info("Catalogue statistics built")
+    return True
+
+async def load_stats(db: AsyncSession, kind: str, school_id=None, sector_id=None) -> list:
+    """
+    Statistics of the schools, sectors or blocks (kind), optionally those of one school
+    or sector, ordered by name. Entities without statistics yet count as empty.
+    """
+    model = STATS_KINDS[kind][0]
+    stmt = (
+        select(
+            model.id, model.name, CatalogueStats.problem_count, CatalogueStats.block_count,
+            CatalogueStats.min_grade_ordinal, CatalogueStats.max_grade_ordinal, CatalogueStats.grade_histogram
+        )
+        .outerjoin(CatalogueStats, and_(CatalogueStats.kind == kind, CatalogueStats.entity_id == model.id))
+        .order_by(model.name)
+    )
+    if school_id:
+        stmt = stmt.where((model.id if model is School else model.school_id) == school_id)
+    if sector_id:
+        if model is School:
+            raise ValueError("sector_id does not apply to schools")
+        stmt = stmt.where((model.id if model is Sector else model.sector_id) == sector_id)
+
+    items = []
+    for row in (await db.execute(stmt)).all():
+        histogram = row.grade_histogram or {}
+        items.append({
+            "id": str(row.id),
+            "name": row.name,
+            "problem_count": row.problem_count or 0,
+            "block_count": None if kind == "block" else row.block_count or 0,
+            "min_grade": ordinal_grade(row.min_grade_ordinal),
+            "max_grade": ordinal_grade(row.max_grade_ordinal),
+            # In grade order
+            "grades": {grade: histogram[grade] for grade in FONT_GRADES if grade in histogram},
+        })
+    return items
@@ -0,0 +1,42 @@
+import json
+import logging
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.database.connection import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+def wants_ndjson(request: Request, stream: bool = False) -> bool:
+    """Whether the client asked for a streamed response, with stream=1 or Accept: application/x-ndjson."""
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_response(stmt, serialize, batch_size: int = STREAM_BATCH_SIZE) -> StreamingResponse:
+    """
+    Stream the rows of stmt as newline-delimited JSON, one item per line.
+
+    The rows are read from a server-side cursor batch_size at a time, so neither the
+    time to the first byte nor the memory used depend on the number of rows.
+    serialize(db, rows) turns a batch of rows into items and may query the session
+    for related data. The request's session is closed before the body is sent, so
+    the stream opens its own.
+    """
+    async def lines():
+        async with AsyncSessionLocal() as db:
+            try:
+                result = await db.stream(stmt.execution_options(yield_per=batch_size))
+                async for rows in result.partitions():
+                    items = await serialize(db, rows)
+                    yield "".join(json.dumps(item, separators=(",", ":"), default=str) + "\n" for item in items)
+            except Exception as e:
+                # The status line is already sent, the client sees a truncated stream
+                logger.error(f"Error streaming rows: {e}", exc_info=True)
+                raise
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
@@ -1,24 +1,30 @@
 import os
 import json
+import heapq
+import asyncio
 import logging
+from contextlib import aclosing
+from types import SimpleNamespace
 from uuid import uuid4
-from math import atan2, sqrt, sin, cos, radians, degrees
-import numpy as np
-
-from shapely.geometry import Point, MultiPoint, LineString
-from shapely.ops import transform
-from pyproj import Transformer
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert, update as update_stmt
 from geoalchemy2 import WKTElement 
-from shapely.wkt import loads as wkt_loads
 
 from app.models.school import School
 from app.models.sector import Sector
 from app.models.block import Block
 from app.models.problem import Problem
+from app.services.geodesy import get_centers_from_tilesets
+from app.services.manifest import manifest_key, load_manifest, record_entries, forget_entries
+from app.services import scanner
+from app.services.progress import SyncProgress
+from app.services.cache import bump_data_version
+from app.services.grades import problem_grade_ordinal
+from app.services.tiles import invalidate_tiles, invalidate_problem_tiles, prune_tile_invalidations
+from app.services.stats import refresh_stats
+from app.services.paths import path_resolver
+from app.services.areas import mark_areas_dirty, refresh_dirty_areas, load_dirty_areas
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG) 
@@ -29,304 +35,622 @@ config_path = os.path.abspath(
 with open(config_path, "r") as f:
     data = json.load(f)
     BASE_PATH = data["modelsdir"]
+    SYNC_EXECUTOR = data.get("syncExecutor", "thread")
+    SYNC_WORKERS = data.get("syncWorkers") or os.cpu_count() or 1
+    SYNC_DEFAULTS = {
+        "buffer_meters": data.get("geometriesBuffer", 5),
+        "update_problems": data.get("updateProblems", False),
+        "geometry_mode": data.get("geometriesMode", "postgis"),
+        "force": False,
+        "paths": None,
+        "dry_run": False,
+    }
 
-def ecef_to_geodetic(x, y, z):
-    """Convert ECEF coordinates to WGS84 (lat, lon, alt)."""
-    a = 6378137.0 
-    e2 = 6.69437999014e-3
-    lon = atan2(y, x)
-    p = sqrt(x**2 + y**2)
-    lat = atan2(z, p * (1 - e2))
-
-    for _ in range(5):
-        N = a / sqrt(1 - e2 * (sin(lat) ** 2))
-        alt = p / cos(lat) - N
-        lat = atan2(z, p * (1 - e2 * N / (N + alt)))
-
-    return degrees(lat), degrees(lon), alt
-
-def get_center_from_tileset(tileset_path: str):
-    """Read a Cesium ion tileset.json and return (lon, lat) from the transform translation."""
-    try:
-        with open(tileset_path, "r") as f:
-            data = json.load(f)
-
-        transform = data["root"]["transform"]
-        tx, ty, tz, _ = transform[-4:]
-
-        lat, lon, _ = ecef_to_geodetic(tx, ty, tz)
-
-        return lon, lat
+# Entries listed in the dry-run report of slowest block directories and largest problems.json files
+REPORT_SIZE = 10
 
-    except Exception as e:
-        logger.error(f"Error reading {tileset_path}: {e}")
-        return 0.0, 0.0
+def sync_params(**overrides) -> dict:
+    """update() parameters from config.json, with per-call overrides."""
+    return {**SYNC_DEFAULTS, **overrides}
 
-def calculate_convex_hull_area(points: list, buffer_meters: float = 5, utm_epsg: int = 32629):
+async def sync_schools_from_files(
+    db: AsyncSession,
+    tree: dict,
+    progress: SyncProgress | None = None,
+    plan: dict | None = None
+):
     """
-    Receive a list of shapely Points in WGS84 (lon, lat),
-    calculate convex hull and add buffer in meters.
-    Handle cases with 1, 2 or more points.
-    utm_epsg: EPSG of the UTM zone corresponding to your data.
+    Create/update schools based on subdirectories in BASE_PATH.
+    With a plan dict nothing is written, the schools to create are listed in it instead.
     """
-    if not points:
-        return None
-
-    transformer_to_utm = Transformer.from_crs("epsg:4326", f"epsg:{utm_epsg}", always_xy=True)
-    transformer_to_wgs84 = Transformer.from_crs(f"epsg:{utm_epsg}", "epsg:4326", always_xy=True)
-
-    if len(points) == 1:
-        point_utm = transform(transformer_to_utm.transform, points[0])
-        buffered = point_utm.buffer(buffer_meters)
-        return transform(transformer_to_wgs84.transform, buffered)
-
-    elif len(points) == 2:
-        line_utm = transform(transformer_to_utm.transform, LineString([(p.x, p.y) for p in points]))
-        buffered = line_utm.buffer(buffer_meters, cap_style=1)
-        return transform(transformer_to_wgs84.transform, buffered)
-
-    else:
-        multipoint_utm = MultiPoint([transform(transformer_to_utm.transform, p) for p in points])
-        hull = multipoint_utm.convex_hull
-        buffered = hull.buffer(buffer_meters)
-        return transform(transformer_to_wgs84.transform, buffered)
-
-async def sync_schools_from_files(db: AsyncSession):
-    """Create/update schools based on subdirectories in BASE_PATH."""
-    if not os.path.exists(BASE_PATH):
-        logger.warning(f"Path {BASE_PATH} does not exist")
+    progress = progress or SyncProgress()
+    progress.start("schools", total=len(tree["schools"]))
+    if not tree["schools"]:
+        logger.warning(f"Path {BASE_PATH} does not exist or is empty")
         return []
 
-    dirs = [d for d in os.listdir(BASE_PATH) if os.path.isdir(os.path.join(BASE_PATH, d))]
     existing_schools = {
-        school.name: school for school in (await db.execute(select(School))).scalars().all()
+        school.name: school for school in (await progress.db(db.execute(
+            select(School).where(School.name.in_(tree["schools"]))
+        ))).scalars().all()
     }
 
     processed = []
-    for dirname in dirs:
+    for dirname in tree["schools"]:
         if dirname in existing_schools:
             logger.info(f"Existing school: {dirname}")
-            school = existing_schools[dirname]
+        elif plan is not None:
+            plan["schools_to_create"].append(dirname)
         else:
             school = School(id=uuid4(), name=dirname)
             db.add(school)
             logger.info(f"School added: {dirname}")
         processed.append(dirname)
-
-    if processed:
-        await db.commit()
+        progress.advance()
+
+    if processed and plan is None:
+        created = bool(db.new)
+        if created:
+            await progress.db(bump_data_version(db))
+        await progress.db(db.commit())
+        if created:
+            # New names for the path resolver
+            path_resolver.clear()
     return processed
 
-async def sync_sectors_from_files(db: AsyncSession):
-    """Create/update sectors based on subdirectories within each school."""
+async def sync_sectors_from_files(
+    db: AsyncSession,
+    tree: dict,
+    progress: SyncProgress | None = None,
+    plan: dict | None = None
+):
+    """
+    Create/update sectors based on subdirectories within each school.
+    With a plan dict nothing is written, the sectors to create are listed in it instead.
+    """
+    progress = progress or SyncProgress()
+    progress.start("sectors", total=len(tree["sectors"]))
     existing_schools = {
-        school.name: school for school in (await db.execute(select(School))).scalars().all()
+        school.name: school for school in (await progress.db(db.execute(
+            select(School).where(School.name.in_(tree["schools"]))
+        ))).scalars().all()
     }
     existing_sectors = {
-        sector.name: sector for sector in (await db.execute(select(Sector))).scalars().all()
+        (sector.school_id, sector.name): sector
+        for sector in (await progress.db(db.execute(
+            select(Sector).where(Sector.school_id.in_([school.id for school in existing_schools.values()]))
+        ))).scalars().all()
     }
 
     processed = []
-    for school_name, school in existing_schools.items():
-        school_path = os.path.join(BASE_PATH, school_name)
-        if not os.path.exists(school_path):
-            continue
-
-        sector_dirs = [d for d in os.listdir(school_path) if os.path.isdir(os.path.join(school_path, d))]
-        for sector_name in sector_dirs:
-            if sector_name in existing_sectors:
-                logger.info(f"Existing sector: {sector_name}")
-            else:
-                sector = Sector(id=uuid4(), name=sector_name, school_id=school.id, school_name=school_name)
-                db.add(sector)
-                logger.info(f"Sector added: {sector_name}")
+    for school_name, sector_name in tree["sectors"]:
+        school = existing_schools.get(school_name)
+        if plan is not None:
+            # Sectors of schools the dry run would create are new as well
+            if not school or (school.id, sector_name) not in existing_sectors:
+                plan["sectors_to_create"].append(f"{school_name}/{sector_name}")
             processed.append(sector_name)
+            progress.advance()
+            continue
+        if not school:
+            continue
 
-    if processed:
-        await db.commit()
+        if (school.id, sector_name) in existing_sectors:
+            logger.info(f"Existing sector: {sector_name}")
+        else:
+            sector = Sector(id=uuid4(), name=sector_name, school_id=school.id, school_name=school_name)
+            db.add(sector)
+            logger.info(f"Sector added: {sector_name}")
+        processed.append(sector_name)
+        progress.advance()
+
+    if processed and plan is None:
+        created = bool(db.new)
+        if created:
+            await progress.db(bump_data_version(db))
+        await progress.db(db.commit())
+        if created:
+            # New names for the path resolver
+            path_resolver.clear()
     return processed
 
-async def sync_blocks_from_files(db: AsyncSession):
-    """Create/update blocks based on subdirectories within each sector."""
+def _previous_records(manifest: dict, school: str, sector: str, block: str) -> dict:
+    """Subset of the manifest a block inspection needs, small enough to ship to a worker."""
+    block_key = manifest_key(school, sector, block)
+    keys = (block_key, manifest_key(block_key, "tileset.json"), manifest_key(block_key, "problems.json"))
+    return {key: manifest[key] for key in keys if key in manifest}
+
+async def sync_blocks_from_files(
+    db: AsyncSession,
+    tree: dict,
+    manifest: dict,
+    seen: set,
+    executor,
+    force: bool = False,
+    progress: SyncProgress | None = None,
+    plan: dict | None = None
+):
+    """
+    Create/update blocks based on subdirectories within each sector.
+    Block directories are diffed and their tilesets parsed in the executor;
+    blocks whose tileset.json is unchanged according to the manifest are skipped,
+    the centers of the others are converted from ECEF in a single batch.
+    With a plan dict nothing is written: the blocks to create or update, the areas
+    they would flag and the slowest block directories are listed in it instead.
+    Returns (processed, skipped, inspections) where inspections are indexed by
+    (school, sector, block) names and feed the problems stage.
+    """
+    progress = progress or SyncProgress()
+    progress.start("blocks")
     existing_schools = {
-        school.name: school for school in (await db.execute(select(School))).scalars().all()
+        school.name: school for school in (await progress.db(db.execute(
+            select(School).where(School.name.in_(tree["schools"]))
+        ))).scalars().all()
     }
     existing_sectors = {
-        sector.name: sector for sector in (await db.execute(select(Sector))).scalars().all()
+        (sector.school_id, sector.name): sector
+        for sector in (await progress.db(db.execute(
+            select(Sector).where(Sector.school_id.in_([school.id for school in existing_schools.values()]))
+        ))).scalars().all()
     }
     existing_blocks = {
-        block.name: block for block in (await db.execute(select(Block))).scalars().all()
+        (block.sector_id, block.name): block
+        for block in (await progress.db(db.execute(
+            select(Block).where(Block.school_id.in_([school.id for school in existing_schools.values()]))
+        ))).scalars().all()
     }
 
-    processed = []
-    for school_name, school in existing_schools.items():
-        school_path = os.path.join(BASE_PATH, school_name)
-        if not os.path.exists(school_path):
+    candidates = []
+    for school_name, sector_name, block_name in tree["blocks"]:
+        school = existing_schools.get(school_name)
+        sector = existing_sectors.get((school.id, sector_name)) if school else None
+        if plan is not None:
+            # Stand-ins for the schools and sectors a real run would have created by now
+            school = school or SimpleNamespace(id=None, name=school_name)
+            sector = sector or SimpleNamespace(id=None, name=sector_name)
+        if sector:
+            candidates.append((school, sector, block_name))
+
+    progress.start("blocks", total=len(candidates))
+    inspections = await scanner.run_bounded(
+        executor,
+        scanner.inspect_block,
+        [
+            (BASE_PATH, school.name, sector.name, block_name,
+             _previous_records(manifest, school.name, sector.name, block_name), force,
+             (sector.id, block_name) in existing_blocks)
+            for school, sector, block_name in candidates
+        ],
+        SYNC_WORKERS,
+        on_result=lambda _: progress.advance(),
+        measure=progress.fs
+    )
+
+    skipped = []
+    pending = []
+    entries = list(tree["entries"])
+    for (school, sector, block_name), inspection in zip(candidates, inspections):
+        entries.extend(inspection["entries"])
+
+        block = existing_blocks.get((sector.id, block_name))
+        if block and not inspection["tileset_changed"]:
+            skipped.append(block_name)
             continue
+        pending.append((school, sector, block_name, block, inspection["tileset"]))
+
+    if plan is not None:
+        for school, sector, block_name, block, _ in pending:
+            plan["blocks_to_update" if block else "blocks_to_create"].append(
+                f"{school.name}/{sector.name}/{block_name}"
+            )
+            plan["areas_to_recompute"]["sectors"].add(f"{school.name}/{sector.name}")
+            plan["areas_to_recompute"]["schools"].add(school.name)
+        plan["slowest_blocks"] = [
+            {"path": "/".join(inspection["key"]), "seconds": round(inspection["seconds"], 3)}
+            for inspection in heapq.nlargest(REPORT_SIZE, inspections, key=lambda i: i["seconds"])
+        ]
+        seen.update(entry["path"] for entry in entries)
+        return [block_name for _, _, block_name, *_ in pending], skipped, {i["key"]: i for i in inspections}
+
+    # One vectorized ECEF conversion for every block of the run
+    centers = get_centers_from_tilesets([tileset for *_, tileset in pending])
+
+    # Tiles showing the blocks where they were
+    await progress.db(invalidate_tiles(db, "blocks", [block.id for *_, block, _ in pending if block]))
 
-        for sector_name in os.listdir(school_path):
-            sector_path = os.path.join(school_path, sector_name)
-            if not os.path.isdir(sector_path):
-                continue
-
-            sector = existing_sectors.get(sector_name)
-            if not sector:
-                continue
-
-            for block_name in os.listdir(sector_path):
-                block_path = os.path.join(sector_path, block_name)
-                if not os.path.isdir(block_path):
-                    continue
-
-                tileset_path = os.path.join(block_path, "tileset.json")
-                lon, lat = get_center_from_tileset(tileset_path) if os.path.exists(tileset_path) else (0.0, 0.0)
+    processed = []
+    written = []
+    added = []
+    for (school, sector, block_name, block, _), center in zip(pending, centers):
+        point = WKTElement(f"POINT({center['lon']} {center['lat']})", srid=4326)
+        if block:
+            block.point = point
+            logger.info(f"Block updated: {block_name}")
+        else:
+            block = Block(
+                id=uuid4(),
+                name=block_name,
+                sector_id=sector.id,
+                sector_name=sector.name,
+                school_id=school.id,
+                school_name=school.name,
+                point=point
+            )
+            db.add(block)
+            added.append(block.id)
+            logger.info(f"Block added: {block_name}")
+
+        processed.append(block_name)
+        written.append(block.id)
+
+    # And where they are now
+    await progress.db(db.flush())
+    await progress.db(invalidate_tiles(db, "blocks", written))
+    # Block counts of their sectors and schools
+    await progress.db(refresh_stats(db, added))
+
+    await progress.db(mark_areas_dirty(
+        db,
+        sector_ids=[sector.id for _, sector, *_ in pending],
+        school_ids=[school.id for school, *_ in pending]
+    ))
+
+    seen.update(entry["path"] for entry in entries)
+    await progress.db(record_entries(db, entries, manifest))
+    if pending:
+        await progress.db(bump_data_version(db))
+    await progress.db(db.commit())
+    if added:
+        path_resolver.clear()
+
+    if skipped:
+        logger.info(f"{len(skipped)} blocks skipped, tileset.json unchanged")
+    return processed, skipped, {inspection["key"]: inspection for inspection in inspections}
+
+PROBLEM_FIELDS = ("grade", "grade_ss", "length", "height", "positions")
+# Types each problem column accepts from problems.json or the API, None clearing it
+PROBLEM_FIELD_TYPES = {
+    "name": (str,), "grade": (str, type(None)), "grade_ss": (str, type(None)),
+    "length": (int, float, type(None)), "height": (int, float, type(None)),
+    "positions": (list, type(None)),
+}
+PROBLEM_BATCH_SIZE = 500
+
+async def load_existing_problems(db: AsyncSession, block_ids: list, with_fields: bool = False) -> dict:
+    """
+    Load the existing problems of the given blocks in one query,
+    indexed by (block_id, name). Only keys and ids are loaded unless with_fields is set.
+    """
+    if not block_ids:
+        return {}
 
-                if block_name in existing_blocks:
-                    block = existing_blocks[block_name]
-                    block.point = WKTElement(f"POINT({lon} {lat})", srid=4326)
-                    logger.info(f"Block updated: {block_name}")
-                else:
-                    block = Block(
-                        id=uuid4(),
-                        name=block_name,
-                        sector_id=sector.id,
-                        sector_name=sector_name,
-                        school_id=school.id,
-                        school_name=school_name,
-                        point=WKTElement(f"POINT({lon} {lat})", srid=4326)
-                    )
-                    db.add(block)
-                    logger.info(f"Block added: {block_name}")
+    columns = [Problem.id, Problem.block_id, Problem.name]
+    if with_fields:
+        columns += [getattr(Problem, field) for field in PROBLEM_FIELDS]
 
-                processed.append(block_name)
+    result = await db.execute(select(*columns).where(Problem.block_id.in_(block_ids)))
+    return {(row.block_id, row.name): row for row in result}
 
-    if processed:
-        await db.commit()
-    return processed
+def check_problem_field(field: str, value, key: str | None = None):
+    """Raise ValueError if value cannot be written to the problem column field, called key in the message."""
+    # bool is an int subclass but never a valid length or height
+    if isinstance(value, bool) or not isinstance(value, PROBLEM_FIELD_TYPES[field]):
+        raise ValueError(f"{key or field} has the wrong type")
 
-async def sync_problems_from_files(db: AsyncSession):
+def plan_block_problems(block, problems_data: list, existing: dict, update_existing: bool = False, names=None):
+    """
+    Split the items of a problems.json into rows to insert and rows to update.
+    Items without name and repeated names are ignored; the first occurrence wins.
+    Items with a field of the wrong type are rejected, their messages returned apart.
+    names carries the names already seen across the batches of a streamed file.
+    Returns (new_rows, changed_rows, errors).
+    """
+    new_rows = []
+    changed_rows = []
+    errors = []
+    names = set() if names is None else names
+    for item in problems_data:
+        name = item.get("name")
+        if not name:
+            continue
+        try:
+            for field in ("name", *PROBLEM_FIELDS):
+                check_problem_field(field, item.get(field))
+        except ValueError as e:
+            errors.append(f"problem {name!r}: {e}")
+            continue
+        if name in names:
+            continue
+        names.add(name)
+
+        values = {field: item.get(field) for field in PROBLEM_FIELDS}
+        values["grade_ordinal"] = problem_grade_ordinal(values["grade"], values["grade_ss"])
+        current = existing.get((block.id, name))
+        if current is None:
+            new_rows.append({
+                "id": uuid4(),
+                "name": name,
+                "block_id": block.id,
+                "sector_id": block.sector_id,
+                "school_id": block.school_id,
+                "block_name": block.name,
+                "sector_name": block.sector_name,
+                "school_name": block.school_name,
+                **values
+            })
+        elif update_existing:
+            changes = {
+                field: values[field] for field in PROBLEM_FIELDS
+                if getattr(current, field) != values[field]
+            }
+            if "grade" in changes or "grade_ss" in changes:
+                changes["grade_ordinal"] = values["grade_ordinal"]
+            if changes:
+                changed_rows.append({"id": current.id, **changes})
+
+    return new_rows, changed_rows, errors
+
+async def write_block_problems(db: AsyncSession, new_rows: list, changed_rows: list):
+    """Write problems with batched INSERT and UPDATE-by-primary-key statements. The caller commits."""
+    for start in range(0, len(new_rows), PROBLEM_BATCH_SIZE):
+        await db.execute(insert(Problem), new_rows[start:start + PROBLEM_BATCH_SIZE])
+
+    # Bulk UPDATE by primary key requires homogeneous parameter sets, group rows by changed columns
+    groups = {}
+    for row in changed_rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for rows in groups.values():
+        for start in range(0, len(rows), PROBLEM_BATCH_SIZE):
+            await db.execute(update_stmt(Problem), rows[start:start + PROBLEM_BATCH_SIZE])
+
+async def sync_problems_from_files(
+    db: AsyncSession,
+    inspections: dict,
+    manifest: dict,
+    seen: set,
+    executor,
+    update_existing: bool = False,
+    progress: SyncProgress | None = None,
+    plan: dict | None = None
+):
     """
     Create problems for each block based on problems.json,
     including block_name, sector_name and school_name.
+    Blocks whose problems.json is unchanged according to the manifest are skipped.
+    Changed files are streamed from the executor in batches of problems, a few blocks
+    ahead, and this coroutine writes each batch as it arrives and each block in its own
+    transaction, so memory does not grow with the file size. Malformed items are logged
+    and skipped without aborting the rest of the file.
+    Existing problems are matched by (block_id, name), loaded once for all changed blocks.
+    With update_existing, fields that changed in the JSON are updated as well; the
+    current fields are then loaded block by block.
+    With a plan dict the changed files are parsed and diffed but nothing is written;
+    the problems to create or update and the largest files are listed in the plan.
+    Returns (created, updated, skipped) where skipped holds block names.
     """
+    progress = progress or SyncProgress()
+    progress.start("problems")
     new_problems = []
+    updated_problems = []
+    skipped = []
+    entries = []
+    # Plain rows instead of ORM objects, so a rollback of one block does not expire the others
     existing_blocks = {
-        block.id: block for block in (await db.execute(select(Block).options(selectinload(Block.sector), selectinload(Block.school)))).scalars().all()
+        (block.school_name, block.sector_name, block.name): block
+        for block in (await progress.db(db.execute(
+            select(
+                Block.id, Block.name, Block.sector_id, Block.school_id,
+                Sector.name.label("sector_name"), School.name.label("school_name")
+            )
+            .join(Sector, Block.sector_id == Sector.id)
+            .join(School, Block.school_id == School.id)
+            .where(School.name.in_({school for school, _, _ in inspections}))
+        ))).all()
     }
 
-    for block in existing_blocks.values():
-        block_path = os.path.join(BASE_PATH, block.school.name, block.sector.name, block.name)
-        problems_path = os.path.join(block_path, "problems.json")
-        if not os.path.exists(problems_path):
+    changed_blocks = []
+    for key, inspection in inspections.items():
+        if inspection["problems_entry"] is None:
+            continue
+        block = existing_blocks.get(key)
+        if block is None and plan is not None:
+            # Block the dry run would create: all of its problems are new
+            school_name, sector_name, block_name = key
+            block = SimpleNamespace(
+                id=None, name=block_name, sector_id=None, school_id=None,
+                sector_name=sector_name, school_name=school_name
+            )
+        if block is None:
             continue
 
-        try:
-            with open(problems_path, "r", encoding="utf-8") as f:
-                problems_data = json.load(f)
-
-            block_new_problems = []
-            for item in problems_data:
-                name = item.get("name")
-                if not name:
-                    continue
+        entry = inspection["problems_entry"]
+        seen.add(entry["path"])
+        if not inspection["problems_changed"]:
+            entries.append(entry)
+            skipped.append(block.name)
+            continue
 
-                existing_problem = await db.execute(
-                    select(Problem).where(Problem.name == name, Problem.block_id == block.id)
-                )
-                if existing_problem.scalars().first():
+        changed_blocks.append({"block": block, "path": inspection["problems_path"], "entry": entry})
+
+    progress.start("problems", total=len(changed_blocks))
+    existing = {}
+    if not update_existing:
+        existing = await progress.db(load_existing_problems(
+            db, [item["block"].id for item in changed_blocks if item["block"].id]
+        ))
+
+    files = []
+    stream = scanner.stream_parsed(
+        executor, scanner.read_problems_batch, changed_blocks, SYNC_WORKERS, measure=progress.fs
+    )
+    async with aclosing(stream):
+        async for item, batches in stream:
+            block = item["block"]
+            path = f"{block.school_name}/{block.sector_name}/{block.name}"
+            progress.advance()
+            names = set()
+            created = []
+            updated = []
+            count = 0
+            try:
+                if update_existing and block.id:
+                    existing = await progress.db(load_existing_problems(db, [block.id], with_fields=True))
+
+                while (result := await batches.get()) is not None:
+                    batch, error = result
+                    if error:
+                        raise error
+
+                    count += len(batch["problems"])
+                    new_rows, changed_rows, errors = plan_block_problems(
+                        block, batch["problems"], existing, update_existing, names
+                    )
+                    for message in batch["errors"] + errors:
+                        logger.warning(f"Skipping malformed problem in {path}/problems.json, {message}")
+                        if plan is not None:
+                            plan["errors"].append(f"{path}: {message}")
+                    if plan is None:
+                        await progress.db(write_block_problems(db, new_rows, changed_rows))
+                    created.extend(row["name"] for row in new_rows)
+                    updated.extend(str(row["id"]) for row in changed_rows)
+
+                if plan is not None:
+                    plan["problems_to_create"] += len(created)
+                    plan["problems_to_update"] += len(updated)
+                    files.append({
+                        "path": path,
+                        "size": item["entry"]["size"],
+                        "problems": count,
+                        "seconds": round(item["seconds"], 3),
+                    })
                     continue
 
-                problem = Problem(
-                    id=uuid4(),
-                    name=name,
-                    block_id=block.id,
-                    sector_id=block.sector_id,
-                    school_id=block.school_id,
-                    block_name=block.name,
-                    sector_name=block.sector_name,
-                    school_name=block.school_name,
-                    grade=item.get("grade"),
-                    grade_ss=item.get("grade_ss"),
-                    length=item.get("length"),
-                    height=item.get("height"),
-                    positions=item.get("positions")
-                )
-                db.add(problem)
-                block_new_problems.append(name)
-
-            if block_new_problems:
-                new_problems.extend(block_new_problems)
-                logger.info(f"Problems added for block {block.name}: {block_new_problems}")
-
-        except Exception as e:
-            logger.error(f"Error reading problems.json in {block.name}: {e}")
-
-    if new_problems:
-        await db.commit()
-    return new_problems
-
-async def update(db: AsyncSession, buffer_meters: float = 5):
+                await progress.db(record_entries(db, [item["entry"]]))
+                if created:
+                    await progress.db(invalidate_problem_tiles(db, [block.id]))
+                if created or updated:
+                    await progress.db(refresh_stats(db, [block.id]))
+                    await progress.db(bump_data_version(db))
+                await progress.db(db.commit())
+
+                if created:
+                    new_problems.extend(created)
+                    logger.info(f"{len(created)} problems added for block {block.name}")
+                if updated:
+                    updated_problems.extend(updated)
+                    logger.info(f"{len(updated)} problems updated for block {block.name}")
+
+            except Exception as e:
+                if plan is not None:
+                    plan["errors"].append(f"{path}: {e}")
+                else:
+                    await db.rollback()
+                seen.discard(item["entry"]["path"])
+                logger.error(f"Error reading problems.json in {block.name}: {e}")
+
+    if plan is not None:
+        plan["largest_problems_files"] = heapq.nlargest(REPORT_SIZE, files, key=lambda f: f["size"])
+        return new_problems, updated_problems, skipped
+
+    await progress.db(record_entries(db, entries, manifest))
+    await progress.db(db.commit())
+
+    if skipped:
+        logger.info(f"{len(skipped)} blocks skipped, problems.json unchanged")
+    return new_problems, updated_problems, skipped
+
+async def update(
+    db: AsyncSession,
+    buffer_meters: float = 5,
+    force: bool = False,
+    update_problems: bool = False,
+    geometry_mode: str = "postgis",
+    paths: list | None = None,
+    progress: SyncProgress | None = None,
+    dry_run: bool = False
+):
     """
     Update sectors and schools:
       - Calculate sector areas from their block points (convex hull + buffer_meters)
       - Calculate school areas from all block points of their sectors (convex hull + buffer_meters + 2)
+
+    Blocks are diffed against the persisted filesystem manifest and only those whose
+    tileset.json or problems.json changed are rewritten. force=True ignores the manifest.
+    The directory walk and JSON parsing run in a thread or process pool (config.json
+    syncExecutor / syncWorkers) so the event loop keeps serving requests.
+    update_problems=True also updates existing problems whose fields changed in problems.json.
+    Only the areas of sectors and schools whose blocks were inserted or moved are
+    recalculated. geometry_mode selects where: "postgis" (one grouped statement
+    per level) or "python" (shapely + pyproj over the loaded blocks).
+    paths restricts the sync to school, school/sector or school/sector/block subtrees.
+    progress, if given, is updated stage by stage while the sync runs.
+    dry_run=True computes the change plan without writing anything and returns it with
+    the filesystem and database time of each stage, the slowest block directories
+    and the largest problems.json files.
     """
 
-    schools_updated = await sync_schools_from_files(db)
-    sectors_updated = await sync_sectors_from_files(db)
-    blocks_updated = await sync_blocks_from_files(db)
-    problems_updated = await sync_problems_from_files(db)
-
-    sectors_stmt = select(Sector).options(selectinload(Sector.blocks))
-    sectors_result = await db.execute(sectors_stmt)
-    sectors = sectors_result.scalars().all()
-
-    for sector in sectors:
-        points = []
-        for block in sector.blocks:
-            if block.point:
-                try:
-                    point = wkt_loads(str(block.point))
-                    points.append(Point(point.x, point.y))
-                except Exception as e:
-                    logger.error(f"Error reading point from block {block.id}: {e}")
-
-        logger.info(f"Sector {sector.name} has {len(points)} points")
-
-        if points:
-            hull = calculate_convex_hull_area(points, buffer_meters=buffer_meters)
-            if hull:
-                sector.area = WKTElement(hull.wkt, srid=4326)
-
-    await db.commit()
-
-    schools_stmt = select(School).options(selectinload(School.sectors).selectinload(Sector.blocks))
-    schools_result = await db.execute(schools_stmt)
-    schools = schools_result.scalars().all()
-
-    for school in schools:
-        points = []
-        for sector in school.sectors:
-            for block in sector.blocks:
-                if block.point:
-                    try:
-                        point = wkt_loads(str(block.point))
-                        points.append(Point(point.x, point.y))
-                    except Exception as e:
-                        logger.error(f"Error reading point from block {block.id} (school {school.name}): {e}")
-
-        logger.info(f"School {school.name} has {len(points)} total points from its blocks")
-
-        if points:
-            hull = calculate_convex_hull_area(points, buffer_meters=buffer_meters + 2)
-            if hull:
-                school.area = WKTElement(hull.wkt, srid=4326)
-
-    await db.commit()
+    progress = progress or SyncProgress()
+    scopes = scanner.normalize_scopes(paths)
+    plan = {
+        "schools_to_create": [],
+        "sectors_to_create": [],
+        "blocks_to_create": [],
+        "blocks_to_update": [],
+        "problems_to_create": 0,
+        "problems_to_update": 0,
+        "areas_to_recompute": {"sectors": set(), "schools": set()},
+        "slowest_blocks": [],
+        "largest_problems_files": [],
+        "errors": [],
+    } if dry_run else None
+    seen = set()
+
+    # The manifest load and the directory walk are accounted to the schools stage
+    progress.start("schools")
+    manifest = await progress.db(load_manifest(db, scopes))
+    with scanner.create_executor(SYNC_EXECUTOR, SYNC_WORKERS) as executor:
+        loop = asyncio.get_running_loop()
+        tree = await progress.fs(
+            loop.run_in_executor(executor, scanner.scan_models_tree, BASE_PATH, manifest, scopes)
+        )
+
+        schools_updated = await sync_schools_from_files(db, tree, progress, plan)
+        sectors_updated = await sync_sectors_from_files(db, tree, progress, plan)
+        blocks_updated, blocks_skipped, inspections = await sync_blocks_from_files(
+            db, tree, manifest, seen, executor, force=force, progress=progress, plan=plan
+        )
+        problems_created, problems_updated, problems_skipped = await sync_problems_from_files(
+            db, inspections, manifest, seen, executor, update_existing=update_problems, progress=progress, plan=plan
+        )
+
+    if plan is not None:
+        progress.start("areas")
+        dirty = await progress.db(load_dirty_areas(db))
+        areas = plan["areas_to_recompute"]
+        areas["sectors"] = sorted(areas["sectors"].union(dirty["sectors"]))
+        areas["schools"] = sorted(areas["schools"].union(dirty["schools"]))
+        progress.advance(len(areas["sectors"]) + len(areas["schools"]))
+        progress.finish()
+        plan["blocks_skipped"] = len(blocks_skipped)
+        plan["problems_skipped"] = len(problems_skipped)
+        return {"dry_run": True, "plan": plan, "timings": progress.as_dict()["stages"]}
+
+    await progress.db(forget_entries(db, {key for key in manifest if scanner.scope_contains(scopes, key)} - seen))
+    await progress.db(prune_tile_invalidations(db))
+    await progress.db(db.commit())
+
+    progress.start("areas")
+    areas_updated = await progress.db(refresh_dirty_areas(db, buffer_meters, mode=geometry_mode))
+    progress.advance(len(areas_updated["sectors"]) + len(areas_updated["schools"]))
+    progress.finish()
 
     return {
         "schools_created_or_updated": schools_updated,
         "sectors_created_or_updated": sectors_updated,
         "blocks_created_or_updated": blocks_updated,
-        "problems_created": problems_updated
+        "problems_created": problems_created,
+        "problems_updated": problems_updated,
+        "blocks_skipped": blocks_skipped,
+        "problems_skipped": problems_skipped,
+        "areas_recalculated": areas_updated
     }
\ No newline at end of file
@@ -0,0 +1,181 @@
+import time
+from datetime import timedelta
+import asyncio
+import logging
+from math import atan, sinh, pi, degrees
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, cast, literal, Text, Float
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.school import School
+from app.models.sector import Sector
+from app.models.block import Block
+from app.models.problem import Problem
+from app.models.tile_invalidation import TileInvalidation
+from app.services.cache import ResponseCache, get_data_version
+
+logger = logging.getLogger(__name__)
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MAX_ZOOM = 22
+TILE_EXTENT = 4096
+# Pixels (in tile extent units) of geometry kept around each tile so features crossing
+# the edges are drawn without seams
+TILE_BUFFER = 64
+# Width of the EPSG:3857 world in meters
+WORLD_SIZE = 40075016.685578488
+TILE_CACHE_SIZE = 4096
+# Invalidations older than this are deleted; a cache not refreshed for half of it
+# may have missed some and is cleared instead
+INVALIDATION_RETENTION = 24 * 3600
+# More invalidations than this for a layer in one refresh clear the whole layer
+MAX_INVALIDATIONS_PER_LAYER = 256
+
+# Layer name -> (model, geometry column, problems column counting its problems, extra properties)
+LAYERS = {
+    "schools": (School, School.area, Problem.school_id, ()),
+    "sectors": (Sector, Sector.area, Problem.sector_id, (Sector.school_id,)),
+    "blocks": (Block, Block.point, Problem.block_id, (Block.sector_id,)),
+}
+
+def tile_bounds(z: int, x: int, y: int, buffer: float = 0) -> tuple:
+    """(west, south, east, north) in degrees of tile z/x/y, grown by buffer tile widths."""
+    n = 2 ** z
+    lon = lambda tx: tx / n * 360 - 180
+    lat = lambda ty: degrees(atan(sinh(pi * (1 - 2 * ty / n))))
+    return lon(x - buffer), lat(y + 1 + buffer), lon(x + 1 + buffer), lat(y - buffer)
+
+def _intersects(a: tuple, b: tuple) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+async def build_tile(db: AsyncSession, layer: str, z: int, x: int, y: int) -> bytes:
+    """
+    Encode one layer of tile z/x/y with ST_AsMVT. Features carry their id, name,
+    problem count and parent id; the nested lists of the GeoJSON endpoints are left out.
+    """
+    model, geometry, problem_fk, extra = LAYERS[layer]
+    envelope = func.ST_TileEnvelope(z, x, y)
+    margin = WORLD_SIZE / 2 ** z * TILE_BUFFER / TILE_EXTENT
+    problem_count = select(func.count()).select_from(Problem).where(problem_fk == model.id).scalar_subquery()
+
+    features = (
+        select(
+            func.ST_AsMVTGeom(func.ST_Transform(geometry, 3857), envelope, TILE_EXTENT, TILE_BUFFER, True).label("geom"),
+            cast(model.id, Text).label("id"),
+            model.name,
+            problem_count.label("problem_count"),
+            *(cast(column, Text).label(column.key) for column in extra)
+        )
+        .where(geometry.is_not(None))
+        .where(geometry.intersects(func.ST_Transform(func.ST_Expand(envelope, margin), 4326)))
+        .subquery()
+    )
+    tile = await db.scalar(
+        select(func.ST_AsMVT(features.table_valued(), layer, TILE_EXTENT, "geom")).select_from(features)
+    )
+    return bytes(tile or b"")
+
+async def invalidate_tiles(db: AsyncSession, layer: str, ids):
+    """
+    Record the current bounds of the given features (a list of ids or a select of them)
+    as changed in layer. Call it before and after moving a geometry, and before
+    bump_data_version, which stamps the records. The caller commits.
+    """
+    model, geometry, _, _ = LAYERS[layer]
+    box = func.Box2D(geometry)
+    await db.execute(
+        insert(TileInvalidation).from_select(
+            ["layer", "min_lon", "min_lat", "max_lon", "max_lat"],
+            select(
+                literal(layer),
+                cast(func.ST_XMin(box), Float),
+                cast(func.ST_YMin(box), Float),
+                cast(func.ST_XMax(box), Float),
+                cast(func.ST_YMax(box), Float)
+            ).where(model.id.in_(ids), geometry.is_not(None))
+        )
+    )
+
+async def invalidate_problem_tiles(db: AsyncSession, block_ids):
+    """Problem counts changed in these blocks: record their tiles and those of their sectors and schools."""
+    block_ids = list(block_ids)
+    if not block_ids:
+        return
+    await invalidate_tiles(db, "blocks", block_ids)
+    await invalidate_tiles(db, "sectors", select(Block.sector_id).where(Block.id.in_(block_ids)))
+    await invalidate_tiles(db, "schools", select(Block.school_id).where(Block.id.in_(block_ids)))
+
+async def prune_tile_invalidations(db: AsyncSession):
+    """Delete the invalidations older than INVALIDATION_RETENTION. The caller commits."""
+    await db.execute(
+        delete(TileInvalidation).where(
+            TileInvalidation.created_at < func.now() - timedelta(seconds=INVALIDATION_RETENTION)
+        )
+    )
+
+class TileCache(ResponseCache):
+    """
+    ResponseCache of tiles keyed by (layer, z, x, y). A new data version only evicts
+    the tiles touched by the invalidations recorded with it, the rest carry over.
+    """
+
+    def __init__(self, maxsize: int = TILE_CACHE_SIZE):
+        super().__init__(maxsize)
+        self.version = None
+        self.refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """Catch up with the current data version and return it."""
+        version = await get_data_version(db)
+        if version == self.version:
+            self.refreshed_at = time.monotonic()
+            return version
+
+        async with self._lock:
+            if version == self.version:
+                return version
+
+            if self.version is None or time.monotonic() - self.refreshed_at > INVALIDATION_RETENTION / 2:
+                self.clear()
+            else:
+                result = await db.execute(
+                    select(
+                        TileInvalidation.layer, TileInvalidation.min_lon, TileInvalidation.min_lat,
+                        TileInvalidation.max_lon, TileInvalidation.max_lat
+                    ).where(TileInvalidation.version > self.version, TileInvalidation.version <= version)
+                )
+                self._evict(result.all(), version)
+
+            self.version = version
+            self.refreshed_at = time.monotonic()
+            return version
+
+    def _evict(self, invalidations, version: int):
+        """Drop the tiles intersecting the invalidated bounds and move the others to version."""
+        by_layer = {}
+        for row in invalidations:
+            by_layer.setdefault(row.layer, []).append((row.min_lon, row.min_lat, row.max_lon, row.max_lat))
+
+        evicted = 0
+        for key, entry in list(self._entries.items()):
+            if entry.version != self.version:
+                # Built from data older than the last refresh and never served since
+                del self._entries[key]
+                continue
+            layer, z, x, y = key
+            changed = by_layer.get(layer, [])
+            if len(changed) > MAX_INVALIDATIONS_PER_LAYER:
+                stale = True
+            else:
+                bounds = tile_bounds(z, x, y, TILE_BUFFER / TILE_EXTENT)
+                stale = any(_intersects(bounds, box) for box in changed)
+            if stale:
+                del self._entries[key]
+                evicted += 1
+            else:
+                self._entries[key] = entry._replace(version=version)
+        logger.info(f"Tile cache at version {version}: {evicted} tiles evicted")
+
+tile_cache = TileCache()
@@ -1,3 +1,6 @@
+import uuid
+import base64
+import binascii
 from shapely.wkt import loads as wkt_loads
 from shapely.geometry import mapping
 from geoalchemy2.elements import WKBElement
@@ -29,4 +32,52 @@ def wkt_to_geojson(geom):
 
     except Exception as e:
         print(f"Error converting geometry to GeoJSON: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def group_rows(rows, key: str) -> dict:
+    """Group result rows by the value of one of their columns, keeping their order."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(getattr(row, key), []).append(row)
+    return groups
+
+# Page sizes of the paginated list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(last_id) -> str:
+    """Opaque next-page token: the id of the last row of the page."""
+    return base64.urlsafe_b64encode(uuid.UUID(str(last_id)).bytes).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> uuid.UUID:
+    """Id encoded by encode_cursor. Raises ValueError for a malformed token."""
+    try:
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def parse_bbox(value: str) -> tuple:
+    """"minx,miny,maxx,maxy" in WGS84 degrees. Raises ValueError if malformed or out of range."""
+    try:
+        minx, miny, maxx, maxy = (float(part) for part in value.split(","))
+    except ValueError as e:
+        raise ValueError("bbox must be minx,miny,maxx,maxy") from e
+    if not (-180 <= minx <= maxx <= 180 and -90 <= miny <= maxy <= 90):
+        raise ValueError("bbox must be minx,miny,maxx,maxy in degrees, with min <= max")
+    return minx, miny, maxx, maxy
+
+def after_cursor(stmt, id_column, cursor: str | None):
+    """Restrict stmt to the rows after the one the cursor points to, ordered by id_column."""
+    if cursor:
+        stmt = stmt.where(id_column > decode_cursor(cursor))
+    return stmt.order_by(id_column)
+
+async def keyset_page(db, stmt, id_column, cursor: str | None, limit: int):
+    """
+    Run one page of stmt ordered by id_column, starting after the row the cursor points to.
+    Returns the rows and the cursor of the next page (None on the last one).
+    """
+    rows = (await db.execute(after_cursor(stmt, id_column, cursor).limit(limit + 1))).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1].id)
+    return rows, None
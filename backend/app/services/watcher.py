@@ -0,0 +1,148 @@
+import os
+import asyncio
+import logging
+
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+logger = logging.getLogger(__name__)
+
+WATCHED_FILES = ("tileset.json", "problems.json")
+
+def path_to_scope(base_path: str, path: str):
+    """
+    Map a changed path to the school/sector/block scope that must be synced.
+    Returns None for paths that cannot affect the catalogue (tiles, other files),
+    and () when the models directory itself changed.
+    """
+    rel = os.path.relpath(path, base_path)
+    if rel == ".":
+        return ()
+    parts = tuple(rel.split(os.sep))
+    if parts[0] == "..":
+        return None
+    if len(parts) <= 3:
+        return parts
+    if len(parts) == 4 and parts[3] in WATCHED_FILES:
+        return parts[:3]
+    return None
+
+def snapshot_tree(base_path: str) -> dict:
+    """
+    Polling fallback: (mtime, size) of every school/sector/block directory
+    and of the tileset.json / problems.json files of each block.
+    """
+    snapshot = {}
+
+    def walk(path: str, depth: int):
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return
+        for entry in entries:
+            if depth <= 3 and entry.is_dir():
+                st = entry.stat()
+                snapshot[entry.path] = (st.st_mtime, st.st_size)
+                walk(entry.path, depth + 1)
+            elif depth == 4 and entry.name in WATCHED_FILES and entry.is_file():
+                st = entry.stat()
+                snapshot[entry.path] = (st.st_mtime, st.st_size)
+
+    walk(base_path, 1)
+    return snapshot
+
+class ModelsWatcher:
+    """
+    Watch the models directory and run `on_change(scopes)` for the affected
+    school/sector/block paths once a burst of events has settled.
+    Uses inotify (through watchfiles) when available, polling otherwise.
+    """
+
+    def __init__(
+        self,
+        base_path: str,
+        on_change,
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        poll_interval: float = 5.0,
+        force_polling: bool = False
+    ):
+        self.base_path = base_path
+        self.on_change = on_change
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling or awatch is None
+        self._events = asyncio.Queue()
+        self._stop = asyncio.Event()
+        self._tasks = []
+
+    async def start(self):
+        mode = "polling" if self.force_polling else "inotify"
+        logger.info(f"Watching {self.base_path} for model changes ({mode})")
+        source = self._poll() if self.force_polling else self._notify()
+        self._tasks = [asyncio.create_task(source), asyncio.create_task(self._dispatch())]
+
+    async def stop(self):
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _notify(self):
+        async for changes in awatch(self.base_path, stop_event=self._stop, recursive=True):
+            for _, path in changes:
+                await self._events.put(path)
+
+    async def _poll(self):
+        previous = await asyncio.to_thread(snapshot_tree, self.base_path)
+        while not self._stop.is_set():
+            await asyncio.sleep(self.poll_interval)
+            current = await asyncio.to_thread(snapshot_tree, self.base_path)
+            for path in set(previous) | set(current):
+                if previous.get(path) != current.get(path):
+                    await self._events.put(path)
+            previous = current
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop.is_set():
+            scopes = set()
+            self._collect(scopes, await self._events.get())
+            started = loop.time()
+
+            # Debounce: wait until no event arrives for `debounce` seconds, bounded by max_delay
+            while True:
+                remaining = self.max_delay - (loop.time() - started)
+                if remaining <= 0:
+                    break
+                try:
+                    path = await asyncio.wait_for(self._events.get(), min(self.debounce, remaining))
+                except asyncio.TimeoutError:
+                    break
+                self._collect(scopes, path)
+
+            if not scopes:
+                continue
+
+            # A directory's mtime changes when entries are added or removed, and those
+            # entries are reported too: keep the most specific scopes only
+            scopes = {
+                scope for scope in scopes
+                if not scope or not any(other[:len(scope)] == scope and other != scope for other in scopes)
+            }
+            paths = None if () in scopes else sorted("/".join(scope) for scope in scopes)
+            logger.info(f"Model changes detected, syncing {paths or 'all'}")
+            try:
+                await self.on_change(paths)
+            except Exception as e:
+                logger.error(f"Error syncing watched changes: {e}", exc_info=True)
+
+    def _collect(self, scopes: set, path: str):
+        scope = path_to_scope(self.base_path, path)
+        if scope is not None:
+            scopes.add(scope)
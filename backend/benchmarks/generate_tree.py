@@ -0,0 +1,151 @@
+"""
+Generate a synthetic models directory (schools × sectors × blocks) with tileset.json
+and problems.json files shaped like the ones exported for real boulder fields.
+
+    python -m benchmarks.generate_tree /tmp/bench-models --schools 2 --sectors 5 --blocks 20
+"""
+import os
+import json
+import random
+from math import radians, sin, cos, sqrt
+
+import typer
+
+from app.services.geodesy import WGS84_A, WGS84_E2
+
+GRADES = ["4", "5", "5+", "6a", "6a+", "6b", "6b+", "6c", "6c+", "7a", "7a+", "7b", "7b+", "7c", "8a"]
+
+def geodetic_to_ecef(lat: float, lon: float, alt: float):
+    lat, lon = radians(lat), radians(lon)
+    n = WGS84_A / sqrt(1 - WGS84_E2 * sin(lat) ** 2)
+    return (
+        (n + alt) * cos(lat) * cos(lon),
+        (n + alt) * cos(lat) * sin(lon),
+        (n * (1 - WGS84_E2) + alt) * sin(lat),
+    )
+
+def tileset_json(lat: float, lon: float, alt: float, radius: float) -> dict:
+    """Cesium ion style tileset: east-north-up transform at the block and a local bounding box."""
+    phi, lam = radians(lat), radians(lon)
+    east = (-sin(lam), cos(lam), 0.0)
+    north = (-sin(phi) * cos(lam), -sin(phi) * sin(lam), cos(phi))
+    up = (cos(phi) * cos(lam), cos(phi) * sin(lam), sin(phi))
+    x, y, z = geodetic_to_ecef(lat, lon, alt)
+    return {
+        "asset": {"version": "1.1"},
+        "geometricError": 50,
+        "root": {
+            "transform": [*east, 0.0, *north, 0.0, *up, 0.0, x, y, z, 1.0],
+            "boundingVolume": {"box": [0, 0, 0, radius, 0, 0, 0, radius, 0, 0, 0, radius / 2]},
+            "geometricError": 25,
+            "refine": "REPLACE",
+            "content": {"uri": "tiles/0/0/0/0.glb"},
+        },
+    }
+
+def problems_json(rng: random.Random, lat: float, lon: float, alt: float, count: int, points: int) -> list:
+    problems = []
+    for i in range(count):
+        start_lat = lat + rng.uniform(-3e-5, 3e-5)
+        start_lon = lon + rng.uniform(-3e-5, 3e-5)
+        height = rng.uniform(2, 6)
+        problems.append({
+            "name": f"Problem {i + 1}",
+            "grade": rng.choice(GRADES),
+            "grade_ss": rng.choice(GRADES) if rng.random() < 0.3 else "",
+            "length": round(rng.uniform(2, 10), 2),
+            "height": round(height, 2),
+            "positions": [
+                {
+                    "lat": start_lat + j * rng.uniform(-2e-7, 2e-7),
+                    "lon": start_lon + j * rng.uniform(-2e-7, 2e-7),
+                    "height": alt + height * j / max(points - 1, 1),
+                }
+                for j in range(points)
+            ],
+        })
+    return problems
+
+def generate_tree(
+    path: str,
+    schools: int = 2,
+    sectors: int = 5,
+    blocks: int = 20,
+    problems: int = 15,
+    points: int = 40,
+    seed: int = 0,
+    center: tuple = (42.88, -8.54),
+) -> dict:
+    """
+    Write schools × sectors × blocks directories under path, each block with a tileset.json
+    and a problems.json of `problems` problems with `points` positions each.
+    Sectors are spread a few km around center and blocks within ~200 m of their sector.
+    Returns the counts written.
+    """
+    rng = random.Random(seed)
+    written = {"schools": 0, "sectors": 0, "blocks": 0, "problems": 0}
+
+    for s in range(schools):
+        school_lat = center[0] + rng.uniform(-0.5, 0.5)
+        school_lon = center[1] + rng.uniform(-0.5, 0.5)
+        written["schools"] += 1
+        for t in range(sectors):
+            sector_lat = school_lat + rng.uniform(-0.03, 0.03)
+            sector_lon = school_lon + rng.uniform(-0.03, 0.03)
+            written["sectors"] += 1
+            for b in range(blocks):
+                lat = sector_lat + rng.uniform(-0.002, 0.002)
+                lon = sector_lon + rng.uniform(-0.002, 0.002)
+                alt = rng.uniform(50, 900)
+                block_path = os.path.join(path, f"School {s + 1}", f"Sector {t + 1}", f"Block {b + 1}")
+                os.makedirs(os.path.join(block_path, "tiles"), exist_ok=True)
+
+                with open(os.path.join(block_path, "tileset.json"), "w") as f:
+                    json.dump(tileset_json(lat, lon, alt, rng.uniform(2, 8)), f)
+                with open(os.path.join(block_path, "problems.json"), "w", encoding="utf-8") as f:
+                    json.dump(problems_json(rng, lat, lon, alt, problems, points), f)
+
+                written["blocks"] += 1
+                written["problems"] += problems
+
+    return written
+
+def touch_blocks(path: str, fraction: float, seed: int = 0) -> list:
+    """
+    Rewrite the problems.json of a fraction of the blocks, renaming the first problem
+    and appending a new one, so the next sync has real changes to pick up.
+    Returns the relative paths of the touched blocks.
+    """
+    rng = random.Random(seed)
+    block_paths = sorted(
+        os.path.dirname(os.path.join(root, "problems.json"))
+        for root, _, files in os.walk(path) if "problems.json" in files
+    )
+    touched = rng.sample(block_paths, round(len(block_paths) * fraction)) if block_paths else []
+
+    for block_path in touched:
+        problems_path = os.path.join(block_path, "problems.json")
+        with open(problems_path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data:
+            data[0]["grade"] = rng.choice(GRADES)
+            data.append({**data[-1], "name": f"Problem {len(data) + 1}"})
+        with open(problems_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    return [os.path.relpath(block_path, path) for block_path in touched]
+
+def main(
+    path: str = typer.Argument(..., help="Directory to create the tree in."),
+    schools: int = typer.Option(2, help="Number of schools."),
+    sectors: int = typer.Option(5, help="Sectors per school."),
+    blocks: int = typer.Option(20, help="Blocks per sector."),
+    problems: int = typer.Option(15, help="Problems per block."),
+    points: int = typer.Option(40, help="Line positions per problem."),
+    seed: int = typer.Option(0, help="Random seed."),
+):
+    """Generate a synthetic models directory."""
+    typer.echo(json.dumps(generate_tree(path, schools, sectors, blocks, problems, points, seed)))
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,61 @@
+import pytest
+
+from app.services.grades import (
+    FONT_GRADES, grade_ordinal, problem_grade_ordinal, parse_grade, ordinal_grade
+)
+
+@pytest.mark.parametrize("grade, same_as", [
+    ("6A", "6a"),
+    (" 7b+ ", "7b+"),
+    ("7 a", "7a"),
+    ("5c", "5"),
+    ("4b+", "4+"),
+    ("6", "6a"),
+    ("7+", "7a+"),
+    ("v3", "6a"),
+    ("VB", "3"),
+    ("6c/7a", "7a"),
+    ("7a/+", "7a+"),
+    ("6b-6c", "6c"),
+    ("V4-5", "6c"),
+    ("V4/V5", "6c"),
+])
+def test_equivalent_grades(grade, same_as):
+    assert grade_ordinal(grade) == grade_ordinal(same_as) is not None
+
+def test_font_scale_is_ascending():
+    ordinals = [grade_ordinal(grade) for grade in FONT_GRADES]
+    assert ordinals == sorted(ordinals)
+    assert len(set(ordinals)) == len(ordinals)
+    assert all(ordinal > 0 for ordinal in ordinals)
+
+def test_v_modifiers_sit_between_neighbours():
+    assert grade_ordinal("V2") < grade_ordinal("V3-") < grade_ordinal("V3") < grade_ordinal("V3+") < grade_ordinal("V4")
+
+@pytest.mark.parametrize("grade", [None, "", "  ", "?", "proj", "10a", "2", "V18", "6d", "E5 6a x"])
+def test_unreadable_grades(grade):
+    assert grade_ordinal(grade) is None
+
+@pytest.mark.parametrize("grade", [6, 7.5, ["6a"], {"grade": "6a"}, b"6a", True])
+def test_non_string_grades(grade):
+    assert grade_ordinal(grade) is None
+
+def test_problem_grade_ordinal_takes_the_harder_grade():
+    assert problem_grade_ordinal("6a", "6c") == grade_ordinal("6c")
+    assert problem_grade_ordinal("7a", None) == grade_ordinal("7a")
+    assert problem_grade_ordinal("?", "V5") == grade_ordinal("V5")
+    assert problem_grade_ordinal(None, None) is None
+
+def test_parse_grade():
+    assert parse_grade("7a") == grade_ordinal("7a")
+    with pytest.raises(ValueError):
+        parse_grade("hard")
+
+@pytest.mark.parametrize("grade", FONT_GRADES)
+def test_ordinal_grade_round_trips(grade):
+    assert ordinal_grade(grade_ordinal(grade)) == grade
+
+def test_ordinal_grade_rounds_down():
+    assert ordinal_grade(grade_ordinal("V3-")) == "5+"
+    assert ordinal_grade(grade_ordinal("V3+")) == "6a"
+    assert ordinal_grade(None) is None
@@ -0,0 +1,121 @@
+import io
+import json
+
+import pytest
+
+from app.services import scanner
+from app.services.manifest import ManifestRecord
+
+ITEMS = [
+    {"name": "plain", "grade": "6a"},
+    {"name": "quote \" and backslash \\ and slash \\/", "grade": "7a+"},
+    {"name": "brackets ] } [ { and , inside", "positions": [{"lat": 1.5, "lon": -2e-3}]},
+    {"name": "unicode é ñ ☃ \U0001f9d7", "grade_ss": None},
+    {"name": "nested", "positions": [{"a": [1, [2, [3, {"b": {}}]]]}, [], {}]},
+    {"name": "numbers", "length": 12, "height": 3.25},
+]
+
+def split(data: bytes, chunk_size: int, offset: int = 0) -> list:
+    f = io.BytesIO(data)
+    f.seek(offset)
+    return list(scanner._split_array(f, offset))
+
+@pytest.fixture
+def chunk_size(monkeypatch, request):
+    monkeypatch.setattr(scanner, "STREAM_CHUNK_SIZE", request.param)
+    return request.param
+
+def document(items, indent=None) -> bytes:
+    # ensure_ascii=False keeps multi-byte characters that chunks can split
+    return json.dumps(items, indent=indent, ensure_ascii=False).encode("utf-8")
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64, 65536], indirect=True)
+@pytest.mark.parametrize("indent", [None, 2])
+def test_items_survive_any_chunk_boundary(chunk_size, indent):
+    data = document(ITEMS, indent)
+    result = split(data, chunk_size)
+
+    assert [item for item, *_ in result] == ITEMS
+    assert all(error is None for _, error, *_ in result)
+    # start is the byte offset of the item, next_offset the end of its separator
+    for (item, _, start, next_offset), following in zip(result, result[1:] + [None]):
+        assert json.JSONDecoder().raw_decode(data[start:].decode("utf-8"))[0] == item
+        if following is None:
+            assert next_offset is None
+        else:
+            assert data[start:next_offset].rstrip().endswith(b",")
+            assert data[next_offset:following[2]].strip() == b""
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 65536], indirect=True)
+def test_reading_resumes_at_next_offset(chunk_size):
+    data = document(ITEMS, 2)
+    result = split(data, chunk_size)
+    for index, (*_, next_offset) in enumerate(result[:-1]):
+        assert [item for item, *_ in split(data, chunk_size, next_offset)] == ITEMS[index + 1:]
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 65536], indirect=True)
+@pytest.mark.parametrize("bad", [
+    '{"name": oops}',
+    '{"name": "a \\" ] , {", "grade": }',
+    '{"name": "x", "positions": [1, 2,, {"y": "]"}]}',
+    "{'name': 'single quotes'}",
+])
+def test_malformed_item_is_reported_and_skipped(chunk_size, bad):
+    data = f'[{{"name": "a"}}, {bad}, {{"name": "c"}}]'.encode("utf-8")
+    result = split(data, chunk_size)
+
+    assert [item for item, error, *_ in result if error is None] == [{"name": "a"}, {"name": "c"}]
+    errors = [(error, start) for _, error, start, _ in result if error is not None]
+    assert len(errors) == 1
+    assert data[errors[0][1]:].startswith(bad.encode("utf-8"))
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 65536], indirect=True)
+def test_utf8_bom_is_skipped(chunk_size):
+    data = b"\xef\xbb\xbf" + document(ITEMS[:2])
+    result = split(data, chunk_size)
+
+    assert [item for item, *_ in result] == ITEMS[:2]
+    assert data[result[0][2]:].startswith(b'{"name"')
+    assert [item for item, *_ in split(data, chunk_size, result[0][3])] == ITEMS[1:2]
+
+@pytest.mark.parametrize("data", [b"[]", b"  [ \n ]  ", b"\xef\xbb\xbf[]"])
+def test_empty_array(data):
+    assert split(data, 65536) == []
+
+@pytest.mark.parametrize("data", [b'{"name": "a"}', b"", b"null"])
+def test_not_an_array(data):
+    with pytest.raises(ValueError):
+        split(data, 65536)
+
+def test_read_problems_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(scanner, "STREAM_CHUNK_SIZE", 16)
+    path = tmp_path / "problems.json"
+    path.write_bytes(b"\xef\xbb\xbf" + document(ITEMS[:3] + [1] + ITEMS[3:], 2))
+
+    problems, errors, offset = [], [], 0
+    while offset is not None:
+        batch, offset = scanner.read_problems_batch(str(path), offset, batch_size=2)
+        problems += batch["problems"]
+        errors += batch["errors"]
+
+    assert problems == ITEMS
+    assert len(errors) == 1 and "not a JSON object" in errors[0]
+
+def test_inspect_block_reads_the_tileset_of_a_block_missing_from_the_database(tmp_path):
+    block = tmp_path / "school" / "sector" / "block"
+    block.mkdir(parents=True)
+    transform = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 4797000.0, -783000.0, 4135000.0, 1]
+    (block / "tileset.json").write_text(json.dumps({"root": {"transform": transform}}))
+
+    first = scanner.inspect_block(str(tmp_path), "school", "sector", "block", {})
+    previous = {
+        entry["path"]: ManifestRecord(entry["mtime"], entry["size"], entry["content_hash"])
+        for entry in first["entries"]
+    }
+
+    unchanged = scanner.inspect_block(str(tmp_path), "school", "sector", "block", previous)
+    assert not unchanged["tileset_changed"] and unchanged["tileset"] is None
+
+    missing = scanner.inspect_block(str(tmp_path), "school", "sector", "block", previous, exists=False)
+    assert not missing["tileset_changed"]
+    assert missing["tileset"]["translation"] == transform[12:15]
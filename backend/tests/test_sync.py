@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.services.grades import grade_ordinal
+from app.services.sync import plan_block_problems
+
+BLOCK = SimpleNamespace(
+    id=uuid4(), sector_id=uuid4(), school_id=uuid4(),
+    name="Block", sector_name="Sector", school_name="School"
+)
+
+def test_plan_block_problems_rejects_wrongly_typed_items():
+    items = [
+        {"name": "First", "grade": "6a", "length": 4, "height": 3.5, "positions": [[1, 2]]},
+        {"name": 12, "grade": "6b"},
+        {"name": "Bad length", "grade": "6b", "length": "3m"},
+        {"name": "Bad positions", "positions": {"x": 1}},
+        {"name": "Boolean height", "height": True},
+        {"name": "Second", "grade": None},
+    ]
+    new_rows, changed_rows, errors = plan_block_problems(BLOCK, items, {})
+    assert [row["name"] for row in new_rows] == ["First", "Second"]
+    assert changed_rows == []
+    assert errors == [
+        "problem 12: name has the wrong type",
+        "problem 'Bad length': length has the wrong type",
+        "problem 'Bad positions': positions has the wrong type",
+        "problem 'Boolean height': height has the wrong type",
+    ]
+
+def test_plan_block_problems_keeps_the_name_of_a_rejected_item_free():
+    items = [{"name": "Twice", "length": "3m"}, {"name": "Twice", "length": 3}]
+    new_rows, _, errors = plan_block_problems(BLOCK, items, {})
+    assert [row["length"] for row in new_rows] == [3]
+    assert len(errors) == 1
+
+def test_plan_block_problems_never_writes_a_numeric_grade():
+    items = [{"name": "Numeric", "grade": 7}, {"name": "Numeric ss", "grade": "6a", "grade_ss": 6.5}]
+    new_rows, _, errors = plan_block_problems(BLOCK, items, {})
+    assert new_rows == []
+    assert errors == [
+        "problem 'Numeric': grade has the wrong type",
+        "problem 'Numeric ss': grade_ss has the wrong type",
+    ]
+
+def test_plan_block_problems_sets_the_grade_ordinal():
+    current = SimpleNamespace(id=uuid4(), grade="6a", grade_ss=None, length=None, height=None, positions=None)
+    existing = {(BLOCK.id, "Old"): current}
+    items = [{"name": "New", "grade": "7a+"}, {"name": "Old", "grade": "6"}, {"name": "Other", "grade": "7"}]
+    new_rows, changed_rows, errors = plan_block_problems(BLOCK, items, existing, update_existing=True)
+    assert errors == []
+    assert [(row["name"], row["grade"], row["grade_ordinal"]) for row in new_rows] == [
+        ("New", "7a+", grade_ordinal("7a+")),
+        ("Other", "7", grade_ordinal("7a")),
+    ]
+    # A bare 6 reads as 6a, so only the text changes
+    assert changed_rows == [{"id": current.id, "grade": "6", "grade_ordinal": grade_ordinal("6a")}]